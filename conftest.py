@@ -0,0 +1,37 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from convert_to_directories import main as json_to_dirs
+from utils import rtext
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.fixture
+def git(monkeypatch: pytest.MonkeyPatch):
+    """Run git with a test identity, also for commits made by the code under test."""
+    for role in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{role}_NAME", "test")
+        monkeypatch.setenv(f"GIT_{role}_EMAIL", "test@test")
+
+    def run(*args: str | Path) -> str:
+        return subprocess.run(
+            ["git", *map(str, args)], check=True, capture_output=True, text=True
+        ).stdout
+
+    return run
+
+
+@pytest.fixture
+def fli_work_repo(tmp_path: Path, git) -> Path:
+    """The fli map exported to directories with its meta.json, committed to git."""
+    work = tmp_path / "work"
+    json_to_dirs(TEST_DATA / "fli" / "map.json", work)
+    (work / "meta.json").write_text(rtext(TEST_DATA / "fli" / "meta.json"))
+
+    git("init", "-q", work)
+    git("-C", work, "add", ".")
+    git("-C", work, "commit", "-q", "-m", "map")
+    return work
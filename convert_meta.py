@@ -3,6 +3,7 @@ import os
 from pathlib import Path
 
 from create_map import md_to_html
+from storage import open_repo_storage
 from utils import rjson, wjson
 
 
@@ -14,6 +15,8 @@ def parse_args():
         action="store_true",
     )
     parser.add_argument("--map-repo", type=str)
+    parser.add_argument("--git-repo", type=Path)
+    parser.add_argument("--rev", default="HEAD")
     return vars(parser.parse_args())
 
 
@@ -22,35 +25,52 @@ def setEnv(path_name):
         f.write(f"PATH_NAME={path_name}\n")
 
 
-def main(
-    production=False,
-    map_repo="",
-    map_dir: str | None = None,
-    output_file_name="meta-converted.json",
-):
-    map_path = Path(map_dir or ("map-repo" if production else "test_output"))
-    source_path = Path("source-repo" if production else ".")
+def get_path_name(allowed: dict, map_repo: str) -> str:
+    if not allowed.get(map_repo):
+        raise ValueError(f"Repo: {map_repo} not allowed")
+    return allowed[map_repo]["pathName"]
 
-    meta = rjson(map_path / "meta.json")
 
+def convert_meta(meta: dict, path_name: str | None = None):
+    """Turn a map repository's meta.json into the site's tree settings, in place."""
     if "rootDir" in meta:
         del meta["rootDir"]
     if "sourceFile" in meta:
         del meta["sourceFile"]
 
-    if production:
-        allowed = rjson(source_path / "allowed_maps.json")
-        if not allowed.get(map_repo):
-            raise ValueError(f"Repo: {map_repo} not allowed")
-
-        meta["pathName"] = allowed[map_repo]["pathName"]
-        setEnv(allowed[map_repo]["pathName"])
+    if path_name:
+        meta["pathName"] = path_name
 
     for section in ["note", "coverRootDescription"]:
         if meta.get(section):
             meta[section] = md_to_html(meta[section])
 
-    wjson(meta, source_path / output_file_name)
+    return meta
+
+
+def main(
+    production=False,
+    map_repo="",
+    map_dir: str | None = None,
+    output_file_name="meta-converted.json",
+    git_repo: Path | None = None,
+    rev="HEAD",
+):
+    source_path = Path("source-repo" if production else ".")
+
+    if git_repo:
+        with open_repo_storage(git_repo=git_repo, rev=rev) as storage:
+            meta = storage.read_json(Path(map_dir or "") / "meta.json")
+    else:
+        map_path = Path(map_dir or ("map-repo" if production else "test_output"))
+        meta = rjson(map_path / "meta.json")
+
+    path_name = None
+    if production:
+        path_name = get_path_name(rjson(source_path / "allowed_maps.json"), map_repo)
+        setEnv(path_name)
+
+    wjson(convert_meta(meta, path_name), source_path / output_file_name)
 
 
 if __name__ == "__main__":
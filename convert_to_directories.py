@@ -1,40 +1,23 @@
 import argparse
-import json
 import re
 from pathlib import Path
 from typing import Literal
 
+import json_codec
+from map_ndjson import read_map
+from storage import LOCAL_STORAGE, Storage, ZipStorage
 from utils import (
     OL,
     UL,
+    find_node,
+    get_node_id_idxs,
     get_unique_path,
     html_to_md,
-    rjson,
+    is_node_id,
     truncate_string,
-    wjson,
-    wtext,
 )
 
 
-def get_node_id_idxs(node_id: str, only_node_ids: bool = True) -> list[int]:
-    idxs = []
-    in_closure = None
-    for char in node_id[1:]:
-        if in_closure is not None:
-            if char == ".":
-                idxs.append(int(in_closure))
-                in_closure = None
-            else:
-                in_closure += char
-        else:
-            if char == ".":
-                in_closure = ""
-            else:
-                idxs.append(int(char))
-
-    return [idx for i, idx in enumerate(idxs) if not only_node_ids or i % 2 != 0]
-
-
 def get_node_from_id(node_id: str | None, root: dict | None) -> dict | None:
     if not root or not node_id:
         return
@@ -133,6 +116,58 @@ def get_breakdown_strat(node: dict) -> Literal["sub_nodes", "breakdowns"]:
     return "breakdowns" if len(node["breakdowns"]) > 1 else "sub_nodes"
 
 
+def get_dir_name(node: dict, breakdowns_identifier="."):
+    return sanitize_filename(node["title"]) + (
+        breakdowns_identifier if get_breakdown_strat(node) == "breakdowns" else ""
+    )
+
+
+def get_breakdown_dir_names(node: dict) -> list[str]:
+    """Directory names `create_directory_structure` gives a node's breakdowns."""
+    names: list[str] = []
+    for breakdown in node["breakdowns"]:
+        name = sanitize_filename(
+            breakdown.get("title")
+            or f"Untitled {truncate_string(breakdown.get('paper', {}).get('title', ''), end='_')}"
+        )
+        names.append(
+            get_unique_path(
+                Path(name), spacer="", exists=lambda p: p.name in names
+            ).name
+        )
+    return names
+
+
+def find_subtree(root: dict, selector: str, breakdowns_identifier=".") -> dict | None:
+    """Find a node by its ID or by its path in the exported directory tree."""
+    if is_node_id(selector):
+        return find_node(root, selector)
+
+    parts = list(Path(selector).parts)
+    if parts and parts[0] == get_dir_name(root, breakdowns_identifier):
+        parts.pop(0)
+
+    node = root
+    while parts:
+        if get_breakdown_strat(node) == "breakdowns":
+            b_names = get_breakdown_dir_names(node)
+            if parts[0] not in b_names or len(parts) < 2:
+                return None
+            sub_nodes = node["breakdowns"][b_names.index(parts.pop(0))]["sub_nodes"]
+        else:
+            sub_nodes = (node.get("breakdowns") or [{}])[0].get("sub_nodes") or []
+
+        part = parts.pop(0)
+        node = next(
+            (n for n in sub_nodes if get_dir_name(n, breakdowns_identifier) == part),
+            None,
+        )
+        if not node:
+            return None
+
+    return node
+
+
 def create_directory_structure(
     node,
     root,
@@ -140,6 +175,7 @@ def create_directory_structure(
     convert_html=True,
     preserve_order=True,
     breakdowns_identifier=".",
+    storage: Storage = LOCAL_STORAGE,
 ):
     dir_name = sanitize_filename(node["title"])
     dir_path = parent_path / (
@@ -147,7 +183,7 @@ def create_directory_structure(
         + (breakdowns_identifier if get_breakdown_strat(node) == "breakdowns" else "")
     )
 
-    dir_path.mkdir(parents=True)
+    storage.mkdir(dir_path, parents=True)
 
     sections: list[str] = []
 
@@ -194,13 +230,13 @@ def create_directory_structure(
 
         sections.append(f"### Related Nodes\n\n{link_list}")
 
-    wtext(
-        html_to_md("\n\n".join(sections) + "\n", convert_html),
+    storage.write_text(
         dir_path / f"{dir_name}.md",
+        html_to_md("\n\n".join(sections) + "\n", convert_html),
     )
 
     if node.get("papers"):
-        wjson(node["papers"], dir_path / "papers.json", indent=2)
+        storage.write_json(node["papers"], dir_path / "papers.json", indent=2)
 
     if node.get("breakdowns"):
         for breakdown in node["breakdowns"]:
@@ -209,13 +245,15 @@ def create_directory_structure(
                     breakdown.get("title")
                     or f"Untitled {truncate_string(breakdown.get('paper', {}).get('title', ''), end='_')}"
                 )
-                sub_parent_path = get_unique_path(dir_path / title, spacer="")
-                sub_parent_path.mkdir()
+                sub_parent_path = get_unique_path(
+                    dir_path / title, spacer="", exists=storage.exists
+                )
+                storage.mkdir(sub_parent_path)
                 sub_sections = []
 
                 if breakdown.get("paper"):
                     sub_sections.append(
-                        f"### Paper\n\n```json\n{json.dumps(breakdown['paper'], indent=10).replace(' ' * 10, '\t')}\n```"
+                        f"### Paper\n\n```json\n{json_codec.dumps(breakdown['paper'], indent='\t', ensure_ascii=True)}\n```"
                     )
 
                 if breakdown.get("explanation"):
@@ -235,9 +273,9 @@ def create_directory_structure(
                 if titles != sorted(titles):
                     sub_sections.append(f"### Order\n\n{OL(titles)}")
 
-                wtext(
-                    "\n\n".join(sub_sections) + "\n",
+                storage.write_text(
                     sub_parent_path / f"{sub_parent_path.name}.md",
+                    "\n\n".join(sub_sections) + "\n",
                 )
             else:
                 sub_parent_path = dir_path
@@ -245,13 +283,20 @@ def create_directory_structure(
             if "sub_nodes" in breakdown:
                 for sub_node in breakdown["sub_nodes"]:
                     create_directory_structure(
-                        sub_node, root, sub_parent_path, convert_html, preserve_order
+                        sub_node,
+                        root,
+                        sub_parent_path,
+                        convert_html,
+                        preserve_order,
+                        storage=storage,
                     )
 
 
 def parse_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument("json_file", type=Path, help="The JSON file to convert.")
+    parser.add_argument(
+        "json_file", type=Path, help="The JSON (or .ndjson node stream) to convert."
+    )
     parser.add_argument("--output-path", type=Path, required=True)
     parser.add_argument(
         "--no-markdown",
@@ -259,28 +304,59 @@ def parse_args():
         action="store_false",
         help="Dont convert HTML to Markdown.",
     )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Write the tree into a zip archive at --output-path.",
+    )
+    parser.add_argument(
+        "--subtree",
+        help="Only export the node with this ID or directory path.",
+    )
 
     args = vars(parser.parse_args())
-    args["convert_html"] = args["no_markdown"]
+    args["convert_html"] = args.pop("no_markdown")
     return args
 
 
-def main(json_file: Path, output_path=Path(), convert_html=True, preserve_order=True):
-    data = rjson(json_file)
+def main(
+    json_file: Path,
+    output_path=Path(),
+    convert_html=True,
+    preserve_order=True,
+    archive=False,
+    subtree: str | None = None,
+    storage: Storage | None = None,
+):
+    """`subtree` (a node ID or directory path) exports only that node's directory."""
+    if archive:
+        with ZipStorage(output_path, "w") as zip_storage:
+            return main(
+                json_file,
+                Path(),
+                convert_html,
+                preserve_order,
+                subtree=subtree,
+                storage=zip_storage,
+            )
 
-    output_path.mkdir(parents=True, exist_ok=True)
-    create_directory_structure(data, data, output_path, convert_html, preserve_order)
-    print(
-        f"Directory structure created successfully based on '{data.get('title', 'Root')}'"
-    )
+    storage = storage or LOCAL_STORAGE
+    data = read_map(json_file)
+    node = data
 
+    if subtree:
+        node = find_subtree(data, subtree)
+        if not node:
+            raise ValueError(f"Subtree '{subtree}' not found.")
 
-# if __name__ == "__main__":
-#     main(**parse_args())
+    storage.mkdir(output_path, parents=True, exist_ok=True)
+    create_directory_structure(
+        node, data, output_path, convert_html, preserve_order, storage=storage
+    )
+    print(
+        f"Directory structure created successfully based on '{node.get('title', 'Root')}'"
+    )
 
 
 if __name__ == "__main__":
-    main(
-        json_file=Path("test_data/fli/map.json"),
-        output_path=Path("test_output/fli"),
-    )
+    main(**parse_args())
@@ -1,16 +1,27 @@
 import argparse
-import json
 import re
+from collections.abc import Callable
 from pathlib import Path
 
+import json_codec
+from layout import get_layout_settings, write_layout
+from map_ndjson import read_map, write_ndjson
+from map_patch import write_map_patch
+from map_preview import write_preview
+from map_size import analyze_map, enforce_budgets, print_report
+from map_sqlite import export_sqlite
+from parallel_json import dumps_map
+from search_index import write_search_index
+from storage import LOCAL_STORAGE, Storage, open_repo_storage
 from utils import (
     Breakdown,
     Node,
+    find_node,
+    get_node_id_idxs,
+    is_node_id,
     md_to_html,
     resolve_md_list,
     rjson,
-    rtext,
-    wjson,
 )
 
 
@@ -33,21 +44,23 @@ def split_by_sections(content: str):
     return sections
 
 
-def get_sub_dir_names(dir: Path):
+def get_sub_dir_names(dir: Path, storage: Storage = LOCAL_STORAGE):
     return sorted(
-        [d.name for d in dir.iterdir() if d.is_dir()],
+        [d.name for d in storage.iterdir(dir) if storage.is_dir(d)],
         key=lambda s: s.lstrip("Untitled_"),
     )
 
 
-def resolve_breakdown(file_path: Path, parent_path: Path):
+def resolve_breakdown(
+    file_path: Path, parent_path: Path, storage: Storage = LOCAL_STORAGE
+):
     breakdown: Breakdown = {
         "title": None
         if file_path.stem.startswith("Untitled")
         else desanitize_filename(file_path.stem)
     }
-    sub_dir_names = get_sub_dir_names(parent_path)
-    content = rtext(file_path)
+    sub_dir_names = get_sub_dir_names(parent_path, storage)
+    content = storage.read_text(file_path)
 
     for section_title, section_content in split_by_sections(content):
         match section_title:
@@ -58,7 +71,7 @@ def resolve_breakdown(file_path: Path, parent_path: Path):
                     paper = paper[: paper.rindex("```")]
                 except ValueError:
                     paper = section_content
-                breakdown["paper"] = json.loads(paper)
+                breakdown["paper"] = json_codec.loads(paper)
             case "Explanation":
                 breakdown["explanation"] = md_to_html(section_content)
             case "Order":
@@ -69,14 +82,21 @@ def resolve_breakdown(file_path: Path, parent_path: Path):
     return breakdown, [parent_path / sdn for sdn in sub_dir_names]
 
 
-def resolve_node(file_path: Path, parent_path: Path, is_b: bool, id: str):
+def resolve_node(
+    file_path: Path,
+    parent_path: Path,
+    is_b: bool,
+    id: str,
+    storage: Storage = LOCAL_STORAGE,
+    read_papers=True,
+):
     node: Node = {"id": id, "title": desanitize_filename(file_path.stem)}
-    content = rtext(file_path)
-    sub_dir_names = get_sub_dir_names(parent_path)
+    content = storage.read_text(file_path)
+    sub_dir_names = get_sub_dir_names(parent_path, storage)
 
     papers_path = parent_path / "papers.json"
-    if papers_path.exists():
-        node["papers"] = rjson(papers_path)
+    if read_papers and storage.exists(papers_path):
+        node["papers"] = storage.read_json(papers_path)
 
     for section_title, section_content in split_by_sections(content):
         match section_title:
@@ -120,11 +140,12 @@ def resolve_node(file_path: Path, parent_path: Path, is_b: bool, id: str):
 
     if is_b:
         paper_dir_map: dict[str, str] = {}
-        for sub_dir_name in get_sub_dir_names(parent_path):
+        for sub_dir_name in get_sub_dir_names(parent_path, storage):
             paper_title = (
                 resolve_breakdown(
                     parent_path / sub_dir_name / f"{sub_dir_name}.md",
                     parent_path / sub_dir_name,
+                    storage,
                 )[0]
                 .get("paper", {})
                 .get("title")
@@ -147,20 +168,34 @@ def format_index(idx: int | str):
     return f".{idx}." if int(idx) > 9 else str(idx)
 
 
-def build_directory_map(root_path: Path, map_path: Path, breakdowns_identifier="."):
-    """Build a map of directories to their node information."""
+def build_directory_map(
+    root_path: Path,
+    map_path: Path,
+    breakdowns_identifier=".",
+    storage: Storage = LOCAL_STORAGE,
+    root_id="0",
+    resolve_path: Callable[[Path], str | None] | None = None,
+):
+    """
+    Build a map of directories to their node information.
+    `resolve_path` is asked for the ID of link targets outside of `root_path`.
+    """
     directory_map = {}
     path_to_id_map = {}
 
     # Build the hierarchy and generate IDs
     # Start with root
-    root_id = "0"
     root_dir = root_path
     path_to_id_map[str(root_dir)] = root_id
 
     # Process all directories level by level
     process_directory(
-        root_dir, root_id, directory_map, path_to_id_map, breakdowns_identifier
+        root_dir,
+        root_id,
+        directory_map,
+        path_to_id_map,
+        breakdowns_identifier,
+        storage,
     )
 
     # Update all links to use IDs instead of paths
@@ -174,9 +209,12 @@ def build_directory_map(root_path: Path, map_path: Path, breakdowns_identifier="
                     dir_path = str(map_path / "/".join(path_parts[:-1]))
 
                     # Look up the ID in our path mapping
-                    if dir_path in path_to_id_map:
+                    link_id = path_to_id_map.get(dir_path) or (
+                        resolve_path and resolve_path(Path(dir_path))
+                    )
+                    if link_id:
                         # Create a new link object with just id (and reason if present)
-                        new_link = {"id": path_to_id_map[dir_path]}
+                        new_link = {"id": link_id}
                         if "reason" in link:
                             new_link["reason"] = link["reason"]
                         node_info["links"][i] = new_link
@@ -195,13 +233,14 @@ def process_directory(
     directory_map: dict,
     path_to_id_map: dict,
     breakdowns_identifier=".",
+    storage: Storage = LOCAL_STORAGE,
 ):
     is_b = dir_path.name.endswith(breakdowns_identifier)
     dir_name = dir_path.name[: -len(breakdowns_identifier)] if is_b else dir_path.name
     md_file = dir_path / f"{dir_name}.md"
 
-    if md_file.exists():
-        node, sub_dirs = resolve_node(md_file, dir_path, is_b, node_id)
+    if storage.exists(md_file):
+        node, sub_dirs = resolve_node(md_file, dir_path, is_b, node_id, storage)
         directory_map[node_id] = node
 
         if sub_dirs:
@@ -211,7 +250,7 @@ def process_directory(
 
                 for idx, b_sub_dir in enumerate(sub_dirs):
                     breakdown, sub_node_dirs = resolve_breakdown(
-                        b_sub_dir / f"{b_sub_dir.name}.md", b_sub_dir
+                        b_sub_dir / f"{b_sub_dir.name}.md", b_sub_dir, storage
                     )
                     breakdown["id"] = f"{node_id}{format_index(idx)}"
 
@@ -232,6 +271,7 @@ def process_directory(
                         directory_map,
                         path_to_id_map,
                         breakdowns_identifier,
+                        storage,
                     )
 
                     # If the subdirectory was processed (has an entry in directory_map)
@@ -241,24 +281,194 @@ def process_directory(
                         breakdown["sub_nodes"].append(directory_map[child_node_id])
 
 
-def handle_directory_input(repo_root: Path, meta: dict, output_file: Path):
+class MapNode:
+    """A node of a map directory tree whose content and children load on access."""
+
+    def __init__(self, tree: "MapTree", path: Path, id: str):
+        self.tree = tree
+        self.path = path
+        self.id = id
+        self.is_b = path.name.endswith(tree.breakdowns_identifier)
+        self._resolved: tuple[Node, list[Path]] | None = None
+        self._breakdowns: list[tuple[Breakdown, list[MapNode]]] | None = None
+
+    @property
+    def md_file(self):
+        identifier = self.tree.breakdowns_identifier
+        dir_name = self.path.name[: -len(identifier)] if self.is_b else self.path.name
+        return self.path / f"{dir_name}.md"
+
+    @property
+    def exists(self):
+        return self.tree.storage.exists(self.md_file)
+
+    def _resolve(self):
+        # Only to order the children, so papers.json is left unread
+        if self._resolved is None:
+            self._resolved = resolve_node(
+                self.md_file,
+                self.path,
+                self.is_b,
+                self.id,
+                self.tree.storage,
+                read_papers=False,
+            )
+        return self._resolved
+
+    @property
+    def data(self) -> Node:
+        """The node's own fields, without breakdowns."""
+        node, _ = resolve_node(
+            self.md_file, self.path, self.is_b, self.id, self.tree.storage
+        )
+        return node
+
+    @property
+    def breakdowns(self):
+        """Breakdowns paired with their (not yet loaded) sub nodes."""
+        if self._breakdowns is None:
+            _, sub_dirs = self._resolve()
+            if self.is_b:
+                pairs = []
+                for idx, b_sub_dir in enumerate(sub_dirs):
+                    breakdown, sub_node_dirs = resolve_breakdown(
+                        b_sub_dir / f"{b_sub_dir.name}.md", b_sub_dir, self.tree.storage
+                    )
+                    breakdown["id"] = f"{self.id}{format_index(idx)}"
+                    pairs.append((breakdown, sub_node_dirs))
+            else:
+                pairs = [({"id": f"{self.id}0"}, sub_dirs)] if sub_dirs else []
+
+            self._breakdowns = [
+                (
+                    breakdown,
+                    [
+                        MapNode(
+                            self.tree, sub_dir, f"{breakdown['id']}{format_index(i)}"
+                        )
+                        for i, sub_dir in enumerate(sub_dirs)
+                    ],
+                )
+                for breakdown, sub_dirs in pairs
+            ]
+
+        return self._breakdowns
+
+    @property
+    def children(self):
+        return [
+            child
+            for _, sub_nodes in self.breakdowns
+            for child in sub_nodes
+            if child.exists
+        ]
+
+    def load(self) -> Node:
+        """Fully build this node's subtree, with links resolved to IDs."""
+        directory_map = build_directory_map(
+            self.path,
+            self.tree.repo_root,
+            self.tree.breakdowns_identifier,
+            self.tree.storage,
+            root_id=self.id,
+            resolve_path=self.tree.get_path_id,
+        )
+        return directory_map[self.id]
+
+
+class MapTree:
+    """Lazy map directory tree, reading only the directories on the way to a node."""
+
+    def __init__(
+        self, repo_root: Path, meta: dict | None = None, storage=LOCAL_STORAGE
+    ):
+        self.repo_root = repo_root
+        self.storage = storage
+        self.meta = meta or storage.read_json(repo_root / "meta.json")
+        self.breakdowns_identifier = self.meta.get("breakdownsIdentifier") or "."
+        self.root = MapNode(self, repo_root / self.meta["rootDir"], "0")
+
+    def find(self, selector: str | Path) -> MapNode:
+        """Find a node by its ID or by its directory path."""
+        if isinstance(selector, str) and is_node_id(selector):
+            return self.find_by_id(selector)
+        return self.find_by_path(Path(selector))
+
+    def find_by_id(self, node_id: str) -> MapNode:
+        idxs = get_node_id_idxs(node_id, only_node_ids=False)
+        if len(idxs) % 2:
+            raise ValueError(f"'{node_id}' is not a node ID")
+
+        node = self.root
+        for b_idx, n_idx in zip(idxs[::2], idxs[1::2]):
+            try:
+                node = node.breakdowns[b_idx][1][n_idx]
+            except IndexError:
+                raise ValueError(f"No node with ID '{node_id}'")
+
+        if not node.exists:
+            raise ValueError(f"No node with ID '{node_id}'")
+        return node
+
+    def find_by_path(self, path: Path) -> MapNode:
+        if path.is_relative_to(self.root.path):
+            parts = list(path.relative_to(self.root.path).parts)
+        else:
+            parts = list(path.parts)
+            if parts and parts[0] == self.root.path.name:
+                parts.pop(0)
+
+        node = self.root
+        while parts:
+            # Nodes with breakdowns nest their sub nodes in one directory per breakdown
+            depth = 2 if node.is_b else 1
+            sub_path = node.path.joinpath(*parts[:depth])
+            parts = parts[depth:]
+
+            node = next((c for c in node.children if c.path == sub_path), None)
+            if not node:
+                raise ValueError(f"No node at '{path}'")
+
+        if not node.exists:
+            raise ValueError(f"No node at '{path}'")
+        return node
+
+    def get_path_id(self, path: Path) -> str | None:
+        try:
+            return self.find_by_path(path).id
+        except ValueError:
+            return None
+
+
+def handle_directory_input(
+    repo_root: Path,
+    meta: dict,
+    output_file: Path,
+    storage: Storage = LOCAL_STORAGE,
+    output_storage: Storage = LOCAL_STORAGE,
+    subtree: str | None = None,
+):
     root_path: Path = repo_root / meta["rootDir"]
-    if not root_path.exists() or not root_path.is_dir():
+    if not storage.is_dir(root_path):
         raise ValueError(f"Root directory '{root_path}' not found.")
 
-    # Build the directory map and generate the JSON structure in one step
-    directory_map = build_directory_map(
-        root_path, repo_root, meta.get("breakdownsIdentifier") or "."
-    )
+    if subtree:
+        root_node = MapTree(repo_root, meta, storage).find(subtree).load()
+    else:
+        # Build the directory map and generate the JSON structure in one step
+        directory_map = build_directory_map(
+            root_path, repo_root, meta.get("breakdownsIdentifier") or ".", storage
+        )
 
-    # Get the root node
-    root_node = directory_map.get("0")
-    if not root_node:
-        raise ValueError("Could not find the root node.")
+        # Get the root node
+        root_node = directory_map.get("0")
+        if not root_node:
+            raise ValueError("Could not find the root node.")
 
-    wjson(root_node, output_file)
+    output_storage.write_text(output_file, dumps_map(root_node))
 
     print(f"JSON structure reconstructed successfully to '{output_file}'")
+    return root_node
 
 
 def clean_tree(tree: dict, current_id: str = "", idx: int = 0):
@@ -275,10 +485,24 @@ def clean_tree(tree: dict, current_id: str = "", idx: int = 0):
             clean_tree(child, breakdown["id"], ci)
 
 
-def handle_json_input(map_file: Path, output_file: Path):
-    tree = rjson(map_file)
+def handle_json_input(
+    map_file: Path,
+    output_file: Path,
+    storage: Storage = LOCAL_STORAGE,
+    output_storage: Storage = LOCAL_STORAGE,
+    subtree: str | None = None,
+):
+    tree = read_map(map_file, storage)
     clean_tree(tree)
-    wjson(tree, output_file)
+
+    if subtree:
+        if not is_node_id(subtree):
+            raise ValueError("JSON sources can only be narrowed down by node ID.")
+        tree = find_node(tree, subtree)
+        if not tree:
+            raise ValueError(f"No node with ID '{subtree}'")
+    output_storage.write_text(output_file, dumps_map(tree))
+    return tree
 
 
 def parse_args():
@@ -288,6 +512,73 @@ def parse_args():
         "-p",
         action="store_true",
     )
+    parser.add_argument(
+        "--archive",
+        type=Path,
+        help="Read the map repository from a zip archive instead of a directory.",
+    )
+    parser.add_argument(
+        "--git-repo",
+        type=Path,
+        help="Read the map repository from a local git repository's object store.",
+    )
+    parser.add_argument(
+        "--rev",
+        default="HEAD",
+        help="Commit to read when using --git-repo.",
+    )
+    parser.add_argument(
+        "--search-index",
+        type=Path,
+        dest="search_index_dir",
+        help="Also write a sharded full-text search index to this directory.",
+    )
+    parser.add_argument(
+        "--layout",
+        type=Path,
+        dest="layout_file",
+        help="Also write precomputed title layout for the map's titlesMode settings "
+        "(needs avgTextCharSizes there or in defaultMode).",
+    )
+    parser.add_argument(
+        "--preview",
+        type=Path,
+        dest="preview_dir",
+        help="Also write a preview down to the titlesMode depthLimit and the full "
+        "nodes of each depth, one file per depth, to this directory.",
+    )
+    parser.add_argument(
+        "--ndjson",
+        type=Path,
+        dest="ndjson_file",
+        help="Also write the map as an NDJSON stream of node and breakdown records.",
+    )
+    parser.add_argument(
+        "--sqlite",
+        type=Path,
+        dest="sqlite_file",
+        help="Also export the map to this local SQLite database.",
+    )
+    parser.add_argument(
+        "--previous-map",
+        type=Path,
+        help="The previously published map.json to write a JSON Patch against.",
+    )
+    parser.add_argument(
+        "--patch",
+        type=Path,
+        dest="patch_file",
+        help="Where to write the patch (defaults to the output file with .patch.json).",
+    )
+    parser.add_argument(
+        "--size-budgets",
+        type=Path,
+        help="Print the map's size breakdown and fail if it exceeds these budgets.",
+    )
+    parser.add_argument(
+        "--subtree",
+        help="Only build the node with this ID or directory path below rootDir.",
+    )
     return vars(parser.parse_args())
 
 
@@ -296,18 +587,78 @@ def main(
     repo_root: Path | None = None,
     meta_file: Path | None = None,
     output_file: Path | None = None,
+    archive: Path | None = None,
+    git_repo: Path | None = None,
+    rev="HEAD",
+    search_index_dir: Path | None = None,
+    layout_file: Path | None = None,
+    preview_dir: Path | None = None,
+    ndjson_file: Path | None = None,
+    sqlite_file: Path | None = None,
+    previous_map: Path | None = None,
+    patch_file: Path | None = None,
+    subtree: str | None = None,
+    size_budgets: Path | None = None,
+    storage: Storage | None = None,
+    output_storage: Storage | None = None,
 ):
-    repo_root = repo_root or Path("map-repo" if production else "test_output")
-    meta_file = meta_file or (repo_root / "meta.json")
-    working_path = Path("source-repo" if production else ".")
-    output_file = output_file or (working_path / "map.json")
+    """Build the map in `storage` (local by default) into `output_storage`."""
+    with open_repo_storage(archive, git_repo, rev) as repo_storage:
+        storage = storage or repo_storage
+        output_storage = output_storage or LOCAL_STORAGE
+        repo_root = repo_root or Path(
+            "" if archive or git_repo else "map-repo" if production else "test_output"
+        )
+        meta_file = meta_file or (repo_root / "meta.json")
+        working_path = Path("source-repo" if production else ".")
+        output_file = output_file or (working_path / "map.json")
 
-    meta = rjson(meta_file)
+        meta = storage.read_json(meta_file)
+        if layout_file:
+            get_layout_settings(meta)  # Fail before anything is written
 
-    if meta.get("rootDir"):
-        handle_directory_input(repo_root, meta, output_file)
-    else:
-        handle_json_input(repo_root / meta["sourceFile"], output_file)
+        if meta.get("rootDir"):
+            tree = handle_directory_input(
+                repo_root, meta, output_file, storage, output_storage, subtree
+            )
+        else:
+            tree = handle_json_input(
+                repo_root / meta["sourceFile"],
+                output_file,
+                storage,
+                output_storage,
+                subtree,
+            )
+
+    if search_index_dir:
+        write_search_index(tree, search_index_dir, storage=output_storage)
+    # A subtree keeps its depth in the whole map for the per-depth settings
+    depth_offset = len(get_node_id_idxs(tree["id"]))
+    if layout_file:
+        write_layout(
+            tree, meta, layout_file, depth_offset=depth_offset, storage=output_storage
+        )
+    if preview_dir:
+        write_preview(
+            tree, meta, preview_dir, depth_offset=depth_offset, storage=output_storage
+        )
+    if ndjson_file:
+        write_ndjson(tree, ndjson_file, storage=output_storage)
+    if sqlite_file:
+        export_sqlite(tree, sqlite_file).close()
+    if previous_map:
+        write_map_patch(
+            output_storage.read_json(previous_map),
+            tree,
+            patch_file or output_file.with_suffix(".patch.json"),
+            storage=output_storage,
+        )
+    if size_budgets:
+        report = analyze_map(tree)
+        print_report(report)
+        enforce_budgets(report, rjson(size_budgets))
+
+    return tree
 
 
 if __name__ == "__main__":
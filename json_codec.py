@@ -0,0 +1,98 @@
+import json
+import math
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ("orjson", "json")
+
+# orjson formats some floats differently from `json` (1e-7 vs 1e-07, 0.00001 vs
+# 1e-05). Output where a value looks like such a float is encoded with `json`.
+FLOAT_EXPONENT_PATTERN = re.compile(rb"[:,\[]-?(?:[\d.]+[eE]|0\.0000)")
+INDENT_PATTERN = re.compile(r"^(?:  )+", re.MULTILINE)
+
+_backend: str = "json"
+
+
+def get_available_backends() -> list[str]:
+    return [name for name in BACKENDS if name == "json" or globals()[name]]
+
+
+def set_backend(name: str | None = None):
+    """Use the named backend, or the fastest available one if `name` is None."""
+    global _backend
+
+    available = get_available_backends()
+    if name is None:
+        name = available[0]
+    elif name not in available:
+        raise ValueError(f"JSON backend '{name}' is not available ({available}).")
+    _backend = name
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def loads(text: str | bytes):
+    if _backend == "orjson":
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # e.g. integers beyond 64 bits, let `json` decide
+    return json.loads(text)
+
+
+def has_non_finite(obj) -> bool:
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, float) and not math.isfinite(value):
+            return True
+    return False
+
+
+def dumps_orjson(obj) -> str | None:
+    """orjson's output with an indent of 2, None if it can't match `json.dumps`."""
+    if not isinstance(obj, (dict, list)):
+        return None
+    try:
+        data = orjson.dumps(obj)
+    except orjson.JSONEncodeError:
+        return None  # Non-str keys or integers beyond 64 bits
+    if FLOAT_EXPONENT_PATTERN.search(data):
+        return None
+    # orjson writes NaN and Infinity as null
+    if b"null" in data and has_non_finite(obj):
+        return None
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+
+def dumps(obj, indent: int | str | None = None, ensure_ascii=False) -> str:
+    """The same text as `json.dumps(obj, ensure_ascii=ensure_ascii, indent=indent)`."""
+    if indent is None:
+        # `json` is faster here than orjson with the separators changed to ", "
+        return json.dumps(obj, ensure_ascii=ensure_ascii)
+
+    # orjson has no ASCII only output
+    text = dumps_orjson(obj) if _backend == "orjson" and not ensure_ascii else None
+    if text is None:
+        text = json.dumps(obj, ensure_ascii=ensure_ascii, indent=2)
+
+    if isinstance(indent, int):
+        indent = " " * indent
+    if indent != "  ":
+        text = INDENT_PATTERN.sub(lambda m: indent * (len(m.group()) // 2), text)
+    return text
+
+
+# orjson if installed, unless JSON_BACKEND names another one
+set_backend(os.environ.get("JSON_BACKEND") or None)
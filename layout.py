@@ -0,0 +1,184 @@
+import argparse
+import textwrap
+from pathlib import Path
+
+from storage import LOCAL_STORAGE, Storage
+from utils import Node, iter_nodes, rjson
+
+DEFAULT_MODE = "titlesMode"
+DEFAULT_LINE_HEIGHT = 1.2
+
+
+def get_mode_settings(meta: dict, mode=DEFAULT_MODE) -> dict:
+    return (meta.get("customSettings") or {}).get(mode) or {}
+
+
+def get_depth_limit(meta: dict, mode=DEFAULT_MODE) -> int | None:
+    """The deepest level the mode shows, None for all of them."""
+    return get_mode_settings(meta, mode).get("depthLimit")
+
+
+def get_value_at(values: list | None, idx: int, default=None):
+    if not values:
+        return default
+    return values[min(idx, len(values) - 1)]
+
+
+def get_layout_settings(
+    meta: dict,
+    mode=DEFAULT_MODE,
+    char_sizes: list[dict] | None = None,
+    node_width: float | None = None,
+) -> dict:
+    """The mode's settings, with metrics and width missing there from defaultMode."""
+    settings = get_mode_settings(meta, mode)
+    default_settings = get_mode_settings(meta, "defaultMode")
+    settings = {
+        **settings,
+        "avgTextCharSizes": char_sizes
+        or settings.get("avgTextCharSizes")
+        or default_settings.get("avgTextCharSizes"),
+        "nodeWidth": node_width or settings.get("nodeWidth"),
+    }
+    if not settings["nodeWidth"] and "horizontalSpacing" not in settings:
+        settings["nodeWidth"] = default_settings.get("nodeWidth")
+
+    if not settings["avgTextCharSizes"]:
+        raise ValueError(
+            f"Layout needs avgTextCharSizes in customSettings.{mode} or defaultMode,"
+            " or passed explicitly."
+        )
+    if not settings["nodeWidth"] and "horizontalSpacing" not in settings:
+        raise ValueError(
+            f"Layout needs nodeWidth or horizontalSpacing in customSettings.{mode},"
+            " nodeWidth in defaultMode, or a width passed explicitly."
+        )
+    return settings
+
+
+def get_level_width(settings: dict, depth: int) -> float:
+    return settings["nodeWidth"] or (
+        settings["horizontalSpacing"]
+        + get_value_at(settings.get("horizontalSpacingAdditions"), depth, 0)
+        + settings.get("widthAddition", 0)
+    )
+
+
+def resolve_levels(settings: dict, depth_count: int) -> list[dict]:
+    """Resolve the text metrics and available width for each depth level."""
+    levels = []
+
+    for depth in range(depth_count):
+        char_size = get_value_at(settings["avgTextCharSizes"], depth)
+        width = get_level_width(settings, depth)
+        levels.append(
+            {
+                "textSize": char_size["textSize"],
+                "charW": char_size["charW"],
+                "lineHeight": char_size.get("line_height", DEFAULT_LINE_HEIGHT),
+                "width": width,
+                "maxChars": max(1, int(width // char_size["charW"])),
+            }
+        )
+
+    return levels
+
+
+def layout_title(title: str, level: dict):
+    lines = textwrap.wrap(title, level["maxChars"], break_long_words=False) or [""]
+    return {
+        "lines": lines,
+        "width": round(max(len(line) for line in lines) * level["charW"], 2),
+        "height": round(len(lines) * level["textSize"] * level["lineHeight"], 2),
+    }
+
+
+def build_layout(
+    tree: Node,
+    meta: dict,
+    mode=DEFAULT_MODE,
+    char_sizes: list[dict] | None = None,
+    node_width: float | None = None,
+    depth_offset=0,
+):
+    """Wrap every title to the character budget of its depth in the whole map."""
+    settings = get_layout_settings(meta, mode, char_sizes, node_width)
+    depth_limit = settings.get("depthLimit")
+
+    nodes = [
+        (node, depth)
+        for node, depth in iter_nodes(tree, depth_offset)
+        if depth_limit is None or depth <= depth_limit
+    ]
+    levels = resolve_levels(
+        settings, max((depth for _, depth in nodes), default=-1) + 1
+    )
+
+    return {
+        "mode": mode,
+        "levels": levels,
+        "nodes": {
+            node["id"]: layout_title(node["title"], levels[depth])
+            for node, depth in nodes
+        },
+    }
+
+
+def write_layout(
+    tree: Node,
+    meta: dict,
+    output_file: Path,
+    mode=DEFAULT_MODE,
+    char_sizes: list[dict] | None = None,
+    node_width: float | None = None,
+    depth_offset=0,
+    storage: Storage = LOCAL_STORAGE,
+):
+    storage.write_json(
+        build_layout(tree, meta, mode, char_sizes, node_width, depth_offset),
+        output_file,
+    )
+    print(f"Layout written to '{output_file}'")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("map_file", type=Path, help="A built map.json.")
+    parser.add_argument("meta_file", type=Path)
+    parser.add_argument("output_file", type=Path)
+    parser.add_argument("--mode", default=DEFAULT_MODE)
+    parser.add_argument(
+        "--char-sizes",
+        type=Path,
+        dest="char_sizes_file",
+        help="JSON list of {textSize, charW} per depth, if the mode has no "
+        "avgTextCharSizes.",
+    )
+    parser.add_argument(
+        "--node-width",
+        type=float,
+        help="Node width for every depth, instead of the one in meta.json.",
+    )
+    return vars(parser.parse_args())
+
+
+def main(
+    map_file: Path,
+    meta_file: Path,
+    output_file: Path,
+    mode=DEFAULT_MODE,
+    char_sizes_file: Path | None = None,
+    node_width: float | None = None,
+):
+    write_layout(
+        rjson(map_file),
+        rjson(meta_file),
+        output_file,
+        mode,
+        rjson(char_sizes_file) if char_sizes_file else None,
+        node_width,
+    )
+
+
+if __name__ == "__main__":
+    main(**parse_args())
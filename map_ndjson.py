@@ -0,0 +1,104 @@
+import argparse
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import json_codec
+from storage import LOCAL_STORAGE, Storage
+from utils import Node
+
+# Child lists are left empty in a record; the children follow as records of their own
+CHILD_FIELDS = {"node": "breakdowns", "breakdown": "sub_nodes"}
+
+
+def to_records(tree: Node) -> Iterator[dict]:
+    """Flatten a map into node and breakdown records, parents before children."""
+    stack: list[tuple[dict, str, str | None, int]] = [(tree, "node", None, 0)]
+    while stack:
+        item, kind, parent, position = stack.pop()
+        if not item.get("id"):
+            raise ValueError(f"Every {kind} needs an ID to be streamed.")
+
+        child_field = CHILD_FIELDS[kind]
+        children = item.get(child_field)
+        record = {"_type": kind, "_parent": parent, "_position": position}
+        for key, value in item.items():
+            record[key] = (
+                [] if key == child_field and isinstance(value, list) else value
+            )
+        yield record
+
+        child_kind = "breakdown" if kind == "node" else "node"
+        for i, child in reversed(list(enumerate(children or []))):
+            stack.append((child, child_kind, item["id"], i))
+
+
+def from_records(records: Iterable[dict]) -> Node:
+    """Rebuild the nested map from records in any order."""
+    items: dict[str, tuple[str, dict]] = {}
+    children: dict[str, list[tuple[int, dict]]] = {}
+    root = None
+
+    for record in records:
+        record = dict(record)
+        kind = record.pop("_type")
+        parent = record.pop("_parent")
+        position = record.pop("_position")
+        if kind not in CHILD_FIELDS:
+            raise ValueError(f"Unknown record type '{kind}'")
+
+        items[record["id"]] = (kind, record)
+        if parent is None:
+            root = record
+        else:
+            children.setdefault(parent, []).append((position, record))
+
+    if root is None:
+        raise ValueError("No root node record found.")
+
+    for parent_id, parent_children in children.items():
+        kind, parent = items[parent_id]
+        parent.setdefault(CHILD_FIELDS[kind], []).extend(
+            child for _, child in sorted(parent_children, key=lambda c: c[0])
+        )
+
+    return root
+
+
+def dumps_ndjson(tree: Node) -> str:
+    return "".join(json_codec.dumps(record) + "\n" for record in to_records(tree))
+
+
+def loads_ndjson(text: str) -> Node:
+    return from_records(json_codec.loads(line) for line in text.splitlines() if line)
+
+
+def write_ndjson(tree: Node, output_file: Path, storage: Storage = LOCAL_STORAGE):
+    storage.write_text(output_file, dumps_ndjson(tree))
+
+
+def read_map(map_file: Path, storage: Storage = LOCAL_STORAGE) -> Node:
+    """Read a nested map.json or an NDJSON node stream, depending on the suffix."""
+    if Path(map_file).suffix == ".ndjson":
+        return loads_ndjson(storage.read_text(map_file))
+    return storage.read_json(map_file)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert between a nested map.json and an NDJSON node stream."
+    )
+    parser.add_argument("input_file", type=Path, help="A .json or .ndjson map.")
+    parser.add_argument("output_file", type=Path)
+    return vars(parser.parse_args())
+
+
+def main(input_file: Path, output_file: Path):
+    tree = read_map(input_file)
+    if output_file.suffix == ".ndjson":
+        write_ndjson(tree, output_file)
+    else:
+        LOCAL_STORAGE.write_json(tree, output_file)
+
+
+if __name__ == "__main__":
+    main(**parse_args())
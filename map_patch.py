@@ -0,0 +1,229 @@
+import argparse
+import copy
+from pathlib import Path
+
+import json_codec
+from storage import LOCAL_STORAGE, Storage
+from utils import rjson
+
+# Lists of these fields are matched item by item with `get_item_key` instead of by
+# position, so inserting or reordering a node doesn't rewrite all of its siblings.
+KEYED_FIELDS = {"breakdowns", "sub_nodes"}
+
+
+def escape_pointer(token: str | int):
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def unescape_pointer(token: str):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def get_item_key(item, field: str, position: int):
+    if not isinstance(item, dict):
+        return None
+    paper_title = (item.get("paper") or {}).get("title")
+    if item.get("title") or paper_title:
+        return item.get("title") or paper_title
+    # Untitled breakdowns are only told apart by their order under the node, their
+    # IDs change along with the node's position
+    return position if field == "breakdowns" else item.get("id")
+
+
+def get_item_keys(old: list, new: list, field: str):
+    """Keys pairing `old` with `new` items by title, as IDs change with position."""
+    old_keys = [get_item_key(item, field, i) for i, item in enumerate(old)]
+    new_keys = [get_item_key(item, field, i) for i, item in enumerate(new)]
+    if (
+        None in old_keys + new_keys
+        or len(set(old_keys)) != len(old_keys)
+        or len(set(new_keys)) != len(new_keys)
+    ):
+        return None
+
+    old_key_set, new_key_set = set(old_keys), set(new_keys)
+    renamed = {
+        item.get("id"): key
+        for item, key in zip(old, old_keys)
+        if key not in new_key_set and item.get("id")
+    }
+    for i, (item, key) in enumerate(zip(new, new_keys)):
+        if key not in old_key_set and item.get("id") in renamed:
+            new_keys[i] = renamed.pop(item["id"])
+
+    return old_keys, new_keys
+
+
+def is_same(a, b):
+    return type(a) is type(b) and a == b
+
+
+def diff_values(old, new, path: str, ops: list[dict], field: str | None = None):
+    if isinstance(old, dict) and isinstance(new, dict):
+        diff_dicts(old, new, path, ops)
+    elif isinstance(old, list) and isinstance(new, list):
+        keys = get_item_keys(old, new, field) if field in KEYED_FIELDS else None
+        if keys:
+            diff_keyed_lists(old, new, *keys, path, ops)
+        else:
+            diff_lists(old, new, path, ops)
+    elif not is_same(old, new):
+        ops.append({"op": "replace", "path": path, "value": new})
+
+
+def diff_dicts(old: dict, new: dict, path: str, ops: list[dict]):
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"{path}/{escape_pointer(key)}"})
+    for key, value in new.items():
+        if key in old:
+            diff_values(old[key], value, f"{path}/{escape_pointer(key)}", ops, key)
+
+    # "add" appends a member, so from the first key out of place on, every key is
+    # appended in order: new ones added, existing ones moved onto themselves
+    current = [key for key in old if key in new]
+    new_keys = list(new)
+    first = next(
+        (i for i, key in enumerate(new_keys) if i >= len(current) or current[i] != key),
+        len(new_keys),
+    )
+    for key in new_keys[first:]:
+        key_path = f"{path}/{escape_pointer(key)}"
+        if key in old:
+            ops.append({"op": "move", "from": key_path, "path": key_path})
+        else:
+            ops.append({"op": "add", "path": key_path, "value": new[key]})
+
+
+def diff_lists(old: list, new: list, path: str, ops: list[dict]):
+    for i in range(min(len(old), len(new))):
+        diff_values(old[i], new[i], f"{path}/{i}", ops)
+    for i in range(len(old) - 1, len(new) - 1, -1):
+        ops.append({"op": "remove", "path": f"{path}/{i}"})
+    for i in range(len(old), len(new)):
+        ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+
+
+def diff_keyed_lists(
+    old: list, new: list, old_keys: list, new_keys: list, path: str, ops: list[dict]
+):
+    new_key_set = set(new_keys)
+    for i in range(len(old) - 1, -1, -1):
+        if old_keys[i] not in new_key_set:
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+
+    old_by_key = dict(zip(old_keys, old))
+    current = [key for key in old_keys if key in new_key_set]
+    for i, (key, item) in enumerate(zip(new_keys, new)):
+        if key not in old_by_key:
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": item})
+            current.insert(i, key)
+            continue
+
+        if current[i] != key:
+            from_idx = current.index(key)
+            ops.append(
+                {"op": "move", "from": f"{path}/{from_idx}", "path": f"{path}/{i}"}
+            )
+            current.insert(i, current.pop(from_idx))
+        diff_values(old_by_key[key], item, f"{path}/{i}", ops)
+
+
+def diff_maps(old: dict, new: dict) -> list[dict]:
+    """RFC 6902 operations that turn the `old` map into the `new` one."""
+    ops: list[dict] = []
+    diff_values(old, new, "", ops)
+    return ops
+
+
+def resolve_pointer(doc, path: str):
+    """Return the container and final token a JSON pointer refers to."""
+    tokens = [unescape_pointer(token) for token in path.split("/")[1:]]
+    parent = doc
+    for token in tokens[:-1]:
+        parent = parent[int(token) if isinstance(parent, list) else token]
+    return parent, tokens[-1]
+
+
+def get_at(doc, path: str):
+    if not path:
+        return doc
+    parent, token = resolve_pointer(doc, path)
+    return parent[int(token) if isinstance(parent, list) else token]
+
+
+def remove_at(doc, path: str):
+    parent, token = resolve_pointer(doc, path)
+    return parent.pop(int(token) if isinstance(parent, list) else token)
+
+
+def add_at(doc, path: str, value):
+    if not path:
+        return value
+    parent, token = resolve_pointer(doc, path)
+    if isinstance(parent, list):
+        parent.insert(len(parent) if token == "-" else int(token), value)
+    else:
+        parent[token] = value
+    return doc
+
+
+def apply_patch(doc, ops: list[dict]):
+    """Apply RFC 6902 operations to a copy of `doc`."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        match op["op"]:
+            case "add":
+                doc = add_at(doc, op["path"], copy.deepcopy(op["value"]))
+            case "remove":
+                remove_at(doc, op["path"])
+            case "replace":
+                if not op["path"]:
+                    doc = copy.deepcopy(op["value"])
+                else:
+                    parent, token = resolve_pointer(doc, op["path"])
+                    parent[int(token) if isinstance(parent, list) else token] = (
+                        copy.deepcopy(op["value"])
+                    )
+            case "move":
+                doc = add_at(doc, op["path"], remove_at(doc, op["from"]))
+            case "copy":
+                doc = add_at(doc, op["path"], copy.deepcopy(get_at(doc, op["from"])))
+            case "test":
+                if not is_same(get_at(doc, op["path"]), op["value"]):
+                    raise ValueError(f"Test failed at '{op['path']}'")
+            case _:
+                raise ValueError(f"Unknown patch operation '{op['op']}'")
+    return doc
+
+
+def write_map_patch(
+    previous: dict,
+    tree: dict,
+    output_file: Path,
+    storage: Storage = LOCAL_STORAGE,
+):
+    """Write the patch from `previous` to `tree` once it reproduces `tree` exactly."""
+    ops = diff_maps(previous, tree)
+    if json_codec.dumps(apply_patch(previous, ops)) != json_codec.dumps(tree):
+        raise ValueError("Patch does not reproduce the new map.")
+
+    storage.write_json(ops, output_file)
+    print(f"Patch with {len(ops)} operations written to '{output_file}'")
+    return ops
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("previous_file", type=Path, help="The published map.json.")
+    parser.add_argument("map_file", type=Path, help="The new map.json.")
+    parser.add_argument("output_file", type=Path)
+    return vars(parser.parse_args())
+
+
+def main(previous_file: Path, map_file: Path, output_file: Path):
+    write_map_patch(rjson(previous_file), rjson(map_file), output_file)
+
+
+if __name__ == "__main__":
+    main(**parse_args())
@@ -0,0 +1,132 @@
+import argparse
+from pathlib import Path
+
+from layout import get_depth_limit
+from storage import LOCAL_STORAGE, Storage
+from utils import Breakdown, Node, iter_nodes, rjson
+
+PREVIEW_FIELDS = ("id", "title", "mini_description")
+BREAKDOWN_FIELDS = ("id", "title")
+
+
+def cut_breakdown_fields(breakdown: Breakdown) -> Breakdown:
+    """The preview fields of `breakdown`, keeping only the title of its paper."""
+    preview = {key: breakdown[key] for key in BREAKDOWN_FIELDS if key in breakdown}
+    if isinstance(breakdown.get("paper"), dict):
+        preview["paper"] = {"title": breakdown["paper"].get("title")}
+    return preview
+
+
+def cut_breakdowns(node: Node, depth: int, max_depth: int) -> list[Breakdown]:
+    return [
+        {
+            **cut_breakdown_fields(breakdown),
+            "sub_nodes": [
+                cut_node(sub_node, depth + 1, max_depth)
+                for sub_node in breakdown.get("sub_nodes") or []
+            ],
+        }
+        for breakdown in node.get("breakdowns") or []
+    ]
+
+
+def cut_node(node: Node, depth: int, max_depth: int) -> Node:
+    """The preview fields of `node` and its descendants down to `max_depth`."""
+    preview: Node = {key: node[key] for key in PREVIEW_FIELDS if key in node}
+    if not node.get("breakdowns"):
+        return preview
+
+    if depth < max_depth:
+        preview["breakdowns"] = cut_breakdowns(node, depth, max_depth)
+    else:
+        preview["child_count"] = sum(
+            len(breakdown.get("sub_nodes") or []) for breakdown in node["breakdowns"]
+        )
+        preview["subtree_size"] = sum(1 for _ in iter_nodes(node)) - 1
+    return preview
+
+
+def get_node_details(node: Node) -> Node:
+    """All fields of `node`, with its sub nodes cut down to their preview fields."""
+    details = dict(node)
+    if isinstance(node.get("breakdowns"), list):
+        details["breakdowns"] = []
+        for breakdown in node["breakdowns"]:
+            breakdown = dict(breakdown)
+            if isinstance(breakdown.get("sub_nodes"), list):
+                breakdown["sub_nodes"] = [
+                    cut_node(sub_node, 0, 0) for sub_node in breakdown["sub_nodes"]
+                ]
+            details["breakdowns"].append(breakdown)
+    return details
+
+
+def build_preview(tree: Node, depth_limit: int | None, depth_offset=0):
+    """Return the preview tree and the details of every node by depth and ID."""
+    if depth_limit is None:
+        depth_limit = max(depth for _, depth in iter_nodes(tree, depth_offset))
+    levels: dict[int, dict[str, Node]] = {}
+    for node, depth in iter_nodes(tree, depth_offset):
+        if not node.get("id"):
+            raise ValueError("Every node needs an ID to be merged into a preview.")
+        levels.setdefault(depth, {})[node["id"]] = get_node_details(node)
+
+    return cut_node(tree, depth_offset, depth_limit), dict(sorted(levels.items()))
+
+
+def merge_level(preview: Node, level: dict[str, Node]):
+    """Replace the nodes in `level` with their details, in place."""
+    nodes = {node.get("id"): node for node, _ in iter_nodes(preview)}
+    for node_id, details in level.items():
+        node = nodes[node_id]
+        node.clear()
+        node.update(details)
+    return preview
+
+
+def write_preview(
+    tree: Node,
+    meta: dict,
+    output_dir: Path,
+    depth_limit: int | None = None,
+    depth_offset=0,
+    storage: Storage = LOCAL_STORAGE,
+):
+    if depth_limit is None:
+        depth_limit = get_depth_limit(meta)
+    preview, levels = build_preview(tree, depth_limit, depth_offset)
+    if depth_limit is None:
+        print("No depthLimit set, the preview holds every level.")
+
+    storage.mkdir(output_dir, parents=True, exist_ok=True)
+    storage.write_json(
+        {"depthLimit": depth_limit, "levels": list(levels), "tree": preview},
+        output_dir / "preview.json",
+    )
+    for depth, level in levels.items():
+        storage.write_json(level, output_dir / f"{depth}.json")
+
+    print(f"Preview and {len(levels)} level files written to '{output_dir}'")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("map_file", type=Path, help="A built map.json.")
+    parser.add_argument("meta_file", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument(
+        "--depth-limit",
+        type=int,
+        help="Deepest level in the preview (defaults to the titlesMode depthLimit).",
+    )
+    return vars(parser.parse_args())
+
+
+def main(
+    map_file: Path, meta_file: Path, output_dir: Path, depth_limit: int | None = None
+):
+    write_preview(rjson(map_file), rjson(meta_file), output_dir, depth_limit)
+
+
+if __name__ == "__main__":
+    main(**parse_args())
@@ -0,0 +1,211 @@
+import argparse
+from pathlib import Path
+from typing import TypedDict
+
+import json_codec
+from utils import Node, rjson
+
+# Field -> report group. Empty values count as "empty", other fields as "other" and
+# the syntax around them as "structure".
+FIELD_GROUPS = {
+    "id": "ids",
+    "title": "titles",
+    "mini_description": "descriptions",
+    "description": "descriptions",
+    "explanation": "descriptions",
+    "questions": "questions",
+    "papers": "papers",
+    "paper": "papers",
+    "links": "links",
+}
+CHILD_FIELDS = {"breakdowns", "sub_nodes"}
+
+
+class NodeSize(TypedDict):
+    id: str | None
+    title: str | None
+    depth: int
+    own: int
+    subtree: int
+
+
+class SizeReport(TypedDict):
+    total: int
+    fields: dict[str, int]
+    depths: dict[int, int]
+    nodes: list[NodeSize]
+
+
+class Budgets(TypedDict, total=False):
+    total: int
+    node: int
+    fields: dict[str, int]
+    depths: dict[str, int]
+
+
+def get_size(value) -> int:
+    return len(json_codec.dumps(value).encode())
+
+
+def get_field_group(key: str, value):
+    if value is None or value == "" or value == [] or value == {}:
+        return "empty"
+    return FIELD_GROUPS.get(key, "other")
+
+
+class SizeAnalyzer:
+    def __init__(self):
+        self.fields: dict[str, int] = {}
+        self.nodes: list[NodeSize] = []
+
+    def add(self, group: str, size: int):
+        self.fields[group] = self.fields.get(group, 0) + size
+
+    def measure_object(self, obj: dict, measure_child) -> tuple[int, int]:
+        """Return the object's size and the bytes of its own fields."""
+        size, own = 2 + 2 * max(len(obj) - 1, 0), 0
+        for key, value in obj.items():
+            key_size = get_size(key) + 2
+            if key in CHILD_FIELDS and isinstance(value, list):
+                sizes = [measure_child(child) for child in value]
+                own += sum(child_own for _, child_own in sizes)
+                size += key_size + 2 + 2 * max(len(value) - 1, 0)
+                size += sum(child_size for child_size, _ in sizes)
+            else:
+                field_size = key_size + get_size(value)
+                self.add(get_field_group(key, value), field_size)
+                own += field_size
+                size += field_size
+        return size, own
+
+    def measure_node(self, node: Node, depth=0) -> tuple[int, int]:
+        # A breakdown's fields count towards the node it belongs to
+        def measure_breakdown(breakdown: dict):
+            return self.measure_object(
+                breakdown, lambda sub_node: self.measure_node(sub_node, depth + 1)
+            )
+
+        size, own = self.measure_object(node, measure_breakdown)
+        self.nodes.append(
+            {
+                "id": node.get("id"),
+                "title": node.get("title"),
+                "depth": depth,
+                "own": own,
+                "subtree": size,
+            }
+        )
+        # None of this node's bytes are own bytes of its parent
+        return size, 0
+
+    def analyze(self, tree: Node) -> SizeReport:
+        total, _ = self.measure_node(tree)
+        self.add("structure", total - sum(self.fields.values()))
+
+        depths: dict[int, int] = {}
+        for node in self.nodes:
+            depths[node["depth"]] = depths.get(node["depth"], 0) + node["own"]
+
+        return {
+            "total": total,
+            "fields": dict(sorted(self.fields.items(), key=lambda f: -f[1])),
+            "depths": dict(sorted(depths.items())),
+            "nodes": sorted(self.nodes, key=lambda n: -n["own"]),
+        }
+
+
+def analyze_map(tree: Node) -> SizeReport:
+    return SizeAnalyzer().analyze(tree)
+
+
+def check_budgets(report: SizeReport, budgets: Budgets) -> list[str]:
+    """Describe every budget the report exceeds."""
+    errors = []
+    if "total" in budgets and report["total"] > budgets["total"]:
+        errors.append(f"Map is {report['total']} bytes (budget {budgets['total']})")
+
+    for group, budget in (budgets.get("fields") or {}).items():
+        size = report["fields"].get(group, 0)
+        if size > budget:
+            errors.append(f"Field group '{group}' is {size} bytes (budget {budget})")
+
+    for depth, budget in (budgets.get("depths") or {}).items():
+        size = report["depths"].get(int(depth), 0)
+        if size > budget:
+            errors.append(f"Depth {depth} is {size} bytes (budget {budget})")
+
+    if "node" in budgets:
+        for node in report["nodes"]:
+            if node["own"] > budgets["node"]:
+                errors.append(
+                    f"Node {node['id']} ('{node['title']}') is {node['own']} bytes"
+                    f" (budget {budgets['node']})"
+                )
+
+    return errors
+
+
+def print_report(report: SizeReport, top=10):
+    def share(size: int):
+        return f"{size:>10}  {size / report['total']:6.1%}" if report["total"] else ""
+
+    print(f"Total: {report['total']} bytes")
+    print("\nBy field:")
+    for group, size in report["fields"].items():
+        print(f"  {group:<14}{share(size)}")
+    print("\nBy depth (own bytes):")
+    for depth, size in report["depths"].items():
+        print(f"  {depth:<14}{share(size)}")
+    print(f"\nLargest {top} nodes (own / subtree bytes):")
+    for node in report["nodes"][:top]:
+        print(
+            f"  {node['id'] or '':<14}{node['own']:>10}{node['subtree']:>10}"
+            f"  {node['title']}"
+        )
+
+
+def enforce_budgets(report: SizeReport, budgets: Budgets):
+    errors = check_budgets(report, budgets)
+    if errors:
+        raise ValueError("Map exceeds its size budgets:\n  " + "\n  ".join(errors))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Report what a built map.json's bytes are spent on."
+    )
+    parser.add_argument("map_file", type=Path)
+    parser.add_argument(
+        "--budgets",
+        type=Path,
+        help="A JSON file of size budgets in bytes, every entry optional:"
+        ' {"total": 2000000, "node": 20000, "fields": {"papers": 500000},'
+        ' "depths": {"4": 800000}}. "node" caps the own bytes of each node (its'
+        ' fields and those of its breakdowns), "depths" those of all nodes at a'
+        " depth.",
+    )
+    parser.add_argument(
+        "--max-total", type=int, help="Fail if the map is larger (in bytes)."
+    )
+    parser.add_argument("--top", type=int, default=10)
+    return vars(parser.parse_args())
+
+
+def main(
+    map_file: Path,
+    budgets: Path | None = None,
+    max_total: int | None = None,
+    top=10,
+):
+    report = analyze_map(rjson(map_file))
+    print_report(report, top)
+
+    map_budgets: Budgets = rjson(budgets) if budgets else {}
+    if max_total is not None:
+        map_budgets["total"] = max_total
+    enforce_budgets(report, map_budgets)
+    return report
+
+
+if __name__ == "__main__":
+    main(**parse_args())
@@ -0,0 +1,288 @@
+import argparse
+import sqlite3
+from pathlib import Path
+
+import json_codec
+from map_ndjson import from_records, to_records
+from utils import Node, rjson, wjson
+
+# Item field -> column. Every table also has `keys`, the item's field names in order,
+# and `extra`, the fields that have neither a column nor a table of their own.
+NODE_COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "mini_description": "mini_description",
+    "description": "description",
+}
+BREAKDOWN_COLUMNS = {"id": "id", "title": "title", "explanation": "explanation"}
+QUESTION_COLUMNS = {"id": "id", "question": "question"}
+PAPER_COLUMNS = {"arxiv_id": "arxiv_id", "title": "title", "url": "url"}
+LINK_COLUMNS = {"id": "target_id", "reason": "reason"}
+
+# Fields rebuilt from child rows when they hold a value of this type
+NODE_CHILDREN = {"questions": list, "papers": list, "links": list, "breakdowns": list}
+BREAKDOWN_CHILDREN = {"paper": dict, "sub_nodes": list}
+
+SCHEMA = """
+DROP TABLE IF EXISTS nodes;
+DROP TABLE IF EXISTS breakdowns;
+DROP TABLE IF EXISTS questions;
+DROP TABLE IF EXISTS papers;
+DROP TABLE IF EXISTS links;
+
+CREATE TABLE nodes (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    parent_node_id TEXT,
+    position INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    title TEXT,
+    mini_description TEXT,
+    description TEXT,
+    keys TEXT NOT NULL,
+    extra TEXT NOT NULL
+);
+CREATE TABLE breakdowns (
+    id TEXT PRIMARY KEY,
+    node_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT,
+    explanation TEXT,
+    keys TEXT NOT NULL,
+    extra TEXT NOT NULL
+);
+CREATE TABLE questions (
+    node_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT,
+    question TEXT,
+    keys TEXT NOT NULL,
+    extra TEXT NOT NULL
+);
+CREATE TABLE papers (
+    node_id TEXT NOT NULL,
+    breakdown_id TEXT,
+    position INTEGER NOT NULL,
+    arxiv_id TEXT,
+    title TEXT,
+    url TEXT,
+    keys TEXT NOT NULL,
+    extra TEXT NOT NULL
+);
+CREATE TABLE links (
+    node_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    target_id TEXT,
+    reason TEXT,
+    keys TEXT NOT NULL,
+    extra TEXT NOT NULL
+);
+
+CREATE INDEX nodes_parent_id ON nodes (parent_id);
+CREATE INDEX nodes_parent_node_id ON nodes (parent_node_id);
+CREATE INDEX nodes_path ON nodes (path);
+CREATE INDEX breakdowns_node_id ON breakdowns (node_id);
+CREATE INDEX questions_node_id ON questions (node_id);
+CREATE INDEX papers_node_id ON papers (node_id);
+CREATE INDEX papers_arxiv_id ON papers (arxiv_id);
+CREATE INDEX links_node_id ON links (node_id);
+CREATE INDEX links_target_id ON links (target_id);
+"""
+
+
+def connect(db: str | Path | sqlite3.Connection) -> sqlite3.Connection:
+    return db if isinstance(db, sqlite3.Connection) else sqlite3.connect(db)
+
+
+def split_item(item: dict, columns: dict[str, str], children: dict | None = None):
+    """The column values of `item` along with its `keys` and `extra`."""
+    children = children or {}
+    extra = {
+        key: value
+        for key, value in item.items()
+        if key not in columns
+        and not (key in children and isinstance(value, children[key]))
+    }
+    return {
+        **{column: item.get(field) for field, column in columns.items()},
+        "keys": json_codec.dumps(list(item)),
+        "extra": json_codec.dumps(extra),
+    }
+
+
+def join_item(row: sqlite3.Row, columns: dict[str, str], children: dict) -> dict:
+    """Rebuild an item from its row, taking the fields in `children` as given."""
+    extra = json_codec.loads(row["extra"])
+    item = {}
+    for key in json_codec.loads(row["keys"]):
+        if key in columns:
+            item[key] = row[columns[key]]
+        elif key in extra:
+            item[key] = extra[key]
+        else:
+            item[key] = children.get(key, [])
+    return item
+
+
+def insert_rows(conn: sqlite3.Connection, table: str, rows: list[dict]):
+    if rows:
+        columns = list(rows[0])
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)})"
+            f" VALUES ({', '.join(f':{column}' for column in columns)})",
+            rows,
+        )
+
+
+def export_sqlite(tree: Node, db: str | Path | sqlite3.Connection):
+    conn = connect(db)
+    conn.executescript(SCHEMA)
+
+    # Breakdown ID -> owning node ID, node ID -> (depth, path)
+    breakdown_nodes: dict[str, str] = {}
+    node_paths: dict[str, tuple[int, str]] = {}
+    rows: dict[str, list[dict]] = {
+        "nodes": [],
+        "breakdowns": [],
+        "questions": [],
+        "papers": [],
+        "links": [],
+    }
+
+    for record in to_records(tree):
+        item_id, parent, position = record["id"], record["_parent"], record["_position"]
+        item = {key: value for key, value in record.items() if key[0] != "_"}
+
+        if record["_type"] == "breakdown":
+            breakdown_nodes[item_id] = parent
+            rows["breakdowns"].append(
+                {
+                    "node_id": parent,
+                    "position": position,
+                    **split_item(item, BREAKDOWN_COLUMNS, BREAKDOWN_CHILDREN),
+                }
+            )
+            if isinstance(item.get("paper"), dict):
+                rows["papers"].append(
+                    {
+                        "node_id": parent,
+                        "breakdown_id": item_id,
+                        "position": 0,
+                        **split_item(item["paper"], PAPER_COLUMNS),
+                    }
+                )
+            continue
+
+        parent_node = breakdown_nodes.get(parent)
+        if parent_node:
+            depth, parent_path = node_paths[parent_node]
+            node_paths[item_id] = (depth + 1, f"{parent_path}/{item_id}")
+        else:
+            node_paths[item_id] = (0, item_id)
+
+        depth, path = node_paths[item_id]
+        rows["nodes"].append(
+            {
+                "parent_id": parent,
+                "parent_node_id": parent_node,
+                "position": position,
+                "depth": depth,
+                "path": path,
+                **split_item(item, NODE_COLUMNS, NODE_CHILDREN),
+            }
+        )
+        for field, columns in (
+            ("questions", QUESTION_COLUMNS),
+            ("papers", PAPER_COLUMNS),
+            ("links", LINK_COLUMNS),
+        ):
+            if isinstance(item.get(field), list):
+                for i, child in enumerate(item[field]):
+                    owner = {"node_id": item_id}
+                    if field == "papers":
+                        owner["breakdown_id"] = None
+                    rows[field].append(
+                        {**owner, "position": i, **split_item(child, columns)}
+                    )
+
+    with conn:
+        for table, table_rows in rows.items():
+            insert_rows(conn, table, table_rows)
+
+    return conn
+
+
+def select_children(cursor: sqlite3.Cursor, table: str, columns: dict[str, str]):
+    """The items of `table` by (node ID, breakdown ID) of their owner, in order."""
+    children: dict[tuple, list[dict]] = {}
+    for row in cursor.execute(f"SELECT * FROM {table} ORDER BY position"):
+        owner = (row["node_id"], row["breakdown_id"] if table == "papers" else None)
+        children.setdefault(owner, []).append(join_item(row, columns, {}))
+    return children
+
+
+def import_sqlite(db: str | Path | sqlite3.Connection) -> Node:
+    """Rebuild the map from the tables, including any edits made through SQL."""
+    cursor = connect(db).cursor()
+    cursor.row_factory = sqlite3.Row
+    questions = select_children(cursor, "questions", QUESTION_COLUMNS)
+    papers = select_children(cursor, "papers", PAPER_COLUMNS)
+    links = select_children(cursor, "links", LINK_COLUMNS)
+
+    records = []
+    for row in cursor.execute("SELECT * FROM nodes").fetchall():
+        owner = (row["id"], None)
+        children = {
+            "questions": questions.get(owner, []),
+            "papers": papers.get(owner, []),
+            "links": links.get(owner, []),
+        }
+        records.append(
+            {"_type": "node", "_parent": row["parent_id"], "_position": row["position"]}
+            | join_item(row, NODE_COLUMNS, children)
+        )
+    for row in cursor.execute("SELECT * FROM breakdowns").fetchall():
+        paper = papers.get((row["node_id"], row["id"]))
+        children = {"paper": paper[0] if paper else None}
+        records.append(
+            {
+                "_type": "breakdown",
+                "_parent": row["node_id"],
+                "_position": row["position"],
+            }
+            | join_item(row, BREAKDOWN_COLUMNS, children)
+        )
+
+    return from_records(records)
+
+
+def get_subtree_ids(conn: sqlite3.Connection, node_id: str) -> list[str]:
+    """IDs of a node and all of its descendants, using the `nodes_path` index."""
+    (path,) = conn.execute("SELECT path FROM nodes WHERE id = ?", (node_id,)).fetchone()
+    rows = conn.execute(
+        "SELECT id FROM nodes WHERE path = :path"
+        " OR (path > :path || '/' AND path < :path || '0') ORDER BY path",
+        {"path": path},
+    )
+    return [node_id for (node_id,) in rows]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Export a map.json to SQLite, or import a .db back to map.json."
+    )
+    parser.add_argument("input_file", type=Path, help="A map .json or a .db file.")
+    parser.add_argument("output_file", type=Path)
+    return vars(parser.parse_args())
+
+
+def main(input_file: Path, output_file: Path):
+    if input_file.suffix in (".db", ".sqlite"):
+        wjson(import_sqlite(input_file), output_file)
+    else:
+        export_sqlite(rjson(input_file), output_file).close()
+
+
+if __name__ == "__main__":
+    main(**parse_args())
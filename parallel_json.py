@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+
+import json_codec
+from utils import Node, iter_nodes
+
+# Nodes plus papers. Below this, pool startup costs more than it saves.
+PARALLEL_MIN_ITEMS = 5000
+
+_shared_tree: Node | None = None
+
+
+def count_items(tree: Node):
+    return sum(1 + len(node.get("papers") or []) for node, _ in iter_nodes(tree))
+
+
+def get_subtree_paths(tree: Node, min_chunks: int) -> list[tuple]:
+    """Key paths of the subtrees to encode, descending until there are enough."""
+    level: list[tuple[tuple, Node]] = [((), tree)]
+    while len(level) < min_chunks:
+        children = [
+            ((*path, "breakdowns", bi, "sub_nodes", ni), sub_node)
+            for path, node in level
+            for bi, breakdown in enumerate(node.get("breakdowns") or [])
+            for ni, sub_node in enumerate(breakdown.get("sub_nodes") or [])
+        ]
+        if not children:
+            break
+        level = children
+
+    return [path for path, _ in level if path]
+
+
+def get_at(tree, path: tuple):
+    for key in path:
+        tree = tree[key]
+    return tree
+
+
+def encode_subtree(path: tuple) -> str:
+    return json_codec.dumps(get_at(_shared_tree, path))
+
+
+def splice(value, fragments: dict[int, str], ancestors: set[int]) -> str:
+    if id(value) in fragments:
+        return fragments[id(value)]
+    if id(value) not in ancestors:
+        return json_codec.dumps(value)
+
+    if isinstance(value, dict):
+        items = (
+            f"{json_codec.dumps(key)}: {splice(item, fragments, ancestors)}"
+            for key, item in value.items()
+        )
+        return "{" + ", ".join(items) + "}"
+    return "[" + ", ".join(splice(item, fragments, ancestors) for item in value) + "]"
+
+
+def dumps_map(tree: Node, workers: int | None = None, min_items=PARALLEL_MIN_ITEMS):
+    """`json.dumps(tree, ensure_ascii=False)`, encoding subtrees in forked workers."""
+    global _shared_tree
+
+    workers = workers or os.cpu_count() or 1
+    if (
+        workers < 2
+        or "fork" not in multiprocessing.get_all_start_methods()
+        or any(not isinstance(key, str) for key in tree)
+        or count_items(tree) < min_items
+    ):
+        return json_codec.dumps(tree)
+
+    paths = get_subtree_paths(tree, workers * 4)
+    if not paths:
+        return json_codec.dumps(tree)
+
+    _shared_tree = tree
+    try:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            encoded = pool.map(encode_subtree, paths, chunksize=1)
+    finally:
+        _shared_tree = None
+
+    fragments: dict[int, str] = {}
+    ancestors: set[int] = set()
+    for path, fragment in zip(paths, encoded):
+        fragments[id(get_at(tree, path))] = fragment
+        for i in range(len(path)):
+            ancestors.add(id(get_at(tree, path[:i])))
+
+    return splice(tree, fragments, ancestors)
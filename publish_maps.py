@@ -0,0 +1,215 @@
+import argparse
+import subprocess
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TypedDict
+
+import json_codec
+from convert_meta import convert_meta, get_path_name
+from create_map import main as create_map
+from storage import MemoryStorage, open_repo_storage
+from utils import rjson
+
+SITE_TREES_DIR = Path("static/trees")
+SITE_SETTINGS_DIR = Path("src/lib/tree_settings")
+STAGES = ("build", "meta", "place", "commit")
+
+
+class PublishResult(TypedDict):
+    map_repo: str
+    path_name: str | None
+    changed: list[str]
+    times: dict[str, float]
+    error: str | None
+
+
+@contextmanager
+def timed(times: dict[str, float], stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        times[stage] = times.get(stage, 0.0) + time.perf_counter() - start
+
+
+def find_map_repo(maps_dir: Path, map_repo: str) -> Path:
+    for path in (maps_dir / f"{map_repo}.git", maps_dir / map_repo):
+        if path.is_dir():
+            return path
+    raise FileNotFoundError(f"No local clone of {map_repo} in '{maps_dir}'")
+
+
+def place_file(site_repo: Path, path: Path, text: str) -> bool:
+    """Write `text` to `path` in the site repository unless it's already there."""
+    file = site_repo / path
+    if file.is_file() and file.read_text() == text:
+        return False
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(text)
+    return True
+
+
+def commit_files(site_repo: Path, paths: list[str], message: str):
+    git = ["git", "-C", str(site_repo)]
+    subprocess.run([*git, "add", *paths], check=True)
+    staged = subprocess.run([*git, "diff", "--staged", "--quiet"], check=False)
+    if staged.returncode:
+        subprocess.run([*git, "commit", "-q", "-m", message], check=True)
+
+
+def publish_map(
+    map_repo: str,
+    git_repo: Path,
+    site_repo: Path,
+    path_name: str,
+    rev="HEAD",
+    commit=False,
+) -> PublishResult:
+    times: dict[str, float] = {}
+    output = MemoryStorage()
+
+    with open_repo_storage(git_repo=git_repo, rev=rev) as storage:
+        with timed(times, "build"):
+            create_map(
+                repo_root=Path(""),
+                output_file=Path("map.json"),
+                storage=storage,
+                output_storage=output,
+            )
+        with timed(times, "meta"):
+            meta = convert_meta(storage.read_json(Path("meta.json")), path_name)
+
+    with timed(times, "place"):
+        files = {
+            SITE_TREES_DIR / f"{path_name}.json": output.read_text(Path("map.json")),
+            SITE_SETTINGS_DIR / f"{path_name}.json": json_codec.dumps(meta),
+        }
+        changed = [
+            path.as_posix()
+            for path, text in files.items()
+            if place_file(site_repo, path, text)
+        ]
+
+    if commit and changed:
+        with timed(times, "commit"):
+            commit_files(
+                site_repo,
+                changed,
+                f"Action: Update {path_name} files from source repository",
+            )
+
+    return {
+        "map_repo": map_repo,
+        "path_name": path_name,
+        "changed": changed,
+        "times": times,
+        "error": None,
+    }
+
+
+def publish_maps(
+    site_repo: Path,
+    maps_dir: Path,
+    map_repos: list[str] | None = None,
+    allowed_maps: dict | None = None,
+    rev="HEAD",
+    commit=False,
+) -> list[PublishResult]:
+    """Publish `map_repos` (all allowed maps with a local clone by default)."""
+    allowed_maps = allowed_maps or rjson(Path(__file__).parent / "allowed_maps.json")
+    if not map_repos:
+        map_repos = [
+            map_repo
+            for map_repo in allowed_maps
+            if (maps_dir / f"{map_repo}.git").is_dir() or (maps_dir / map_repo).is_dir()
+        ]
+
+    results: list[PublishResult] = []
+    for map_repo in map_repos:
+        path_name = None
+        try:
+            path_name = get_path_name(allowed_maps, map_repo)
+            results.append(
+                publish_map(
+                    map_repo,
+                    find_map_repo(maps_dir, map_repo),
+                    site_repo,
+                    path_name,
+                    rev,
+                    commit,
+                )
+            )
+        except (OSError, KeyError, ValueError, subprocess.CalledProcessError) as e:
+            print(f"Error publishing {map_repo}: {e}")
+            results.append(
+                {
+                    "map_repo": map_repo,
+                    "path_name": path_name,
+                    "changed": [],
+                    "times": {},
+                    "error": str(e),
+                }
+            )
+
+    return results
+
+
+def print_summary(results: list[PublishResult], elapsed: float):
+    print(f"\n{'Map':<32}" + "".join(f"{stage:>9}" for stage in STAGES) + "  Result")
+    for result in results:
+        times = "".join(
+            f"{result['times'][stage]:>8.2f}s" if stage in result["times"] else " " * 9
+            for stage in STAGES
+        )
+        status = result["error"] or (
+            f"{len(result['changed'])} files changed"
+            if result["changed"]
+            else "unchanged"
+        )
+        print(f"{result['map_repo']:<32}{times}  {status}")
+    print(f"\nPublished {len(results)} maps in {elapsed:.2f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Build maps from local git clones and place them in the site repo."
+    )
+    parser.add_argument(
+        "map_repos", nargs="*", help="owner/name of the maps to publish (default all)."
+    )
+    parser.add_argument("--site-repo", type=Path, required=True)
+    parser.add_argument(
+        "--maps-dir",
+        type=Path,
+        required=True,
+        help="Directory with the map clones as owner/name.git or owner/name.",
+    )
+    parser.add_argument("--rev", default="HEAD")
+    parser.add_argument(
+        "--commit",
+        action="store_true",
+        help="Commit each changed map to the site repository.",
+    )
+    return vars(parser.parse_args())
+
+
+def main(
+    site_repo: Path,
+    maps_dir: Path,
+    map_repos: list[str] | None = None,
+    rev="HEAD",
+    commit=False,
+):
+    start = time.perf_counter()
+    results = publish_maps(site_repo, maps_dir, map_repos, rev=rev, commit=commit)
+    print_summary(results, time.perf_counter() - start)
+
+    if any(result["error"] for result in results):
+        raise SystemExit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main(**parse_args())
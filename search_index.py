@@ -0,0 +1,115 @@
+import argparse
+import html
+import re
+from pathlib import Path
+
+from storage import LOCAL_STORAGE, Storage
+from utils import Node, iter_nodes, rjson
+
+TAG_PATTERN = re.compile(r"<[^>]*>")
+TERM_PATTERN = re.compile(r"[^\W_]+")
+MIN_TERM_LENGTH = 2
+STOP_WORDS = {
+    "an",
+    "and",
+    "are",
+    "as",
+    "at",
+    "be",
+    "by",
+    "for",
+    "from",
+    "in",
+    "is",
+    "it",
+    "of",
+    "on",
+    "or",
+    "that",
+    "the",
+    "this",
+    "to",
+    "with",
+}
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Split text (possibly HTML from `md_to_html`) into lowercase search terms."""
+    if not text:
+        return []
+
+    text = html.unescape(TAG_PATTERN.sub(" ", text)).lower()
+    return [
+        term
+        for term in TERM_PATTERN.findall(text)
+        if len(term) >= MIN_TERM_LENGTH and term not in STOP_WORDS
+    ]
+
+
+def get_node_texts(node: Node):
+    yield node.get("title")
+    yield node.get("mini_description")
+    yield node.get("description")
+    for question in node.get("questions") or []:
+        yield question.get("question")
+    for paper in node.get("papers") or []:
+        yield paper.get("title")
+    for breakdown in node.get("breakdowns") or []:
+        yield breakdown.get("title")
+        yield breakdown.get("explanation")
+        yield (breakdown.get("paper") or {}).get("title")
+
+
+def build_search_index(tree: Node) -> dict[str, list[str]]:
+    """Map each term to the IDs of the nodes containing it, in tree order."""
+    postings: dict[str, dict[str, None]] = {}
+
+    for node, _ in iter_nodes(tree):
+        for text in get_node_texts(node):
+            for term in tokenize(text):
+                postings.setdefault(term, {})[node["id"]] = None
+
+    return {term: list(ids) for term, ids in sorted(postings.items())}
+
+
+def shard_search_index(index: dict[str, list[str]], prefix_length=2):
+    shards: dict[str, dict[str, list[str]]] = {}
+    for term, ids in index.items():
+        shards.setdefault(term[:prefix_length], {})[term] = ids
+    return shards
+
+
+def write_search_index(
+    tree: Node,
+    output_dir: Path,
+    prefix_length=2,
+    storage: Storage = LOCAL_STORAGE,
+):
+    """Write one JSON shard per `term[:prefixLength]` and an `_index.json` manifest."""
+    shards = shard_search_index(build_search_index(tree), prefix_length)
+
+    storage.mkdir(output_dir, parents=True, exist_ok=True)
+    for prefix, shard in shards.items():
+        storage.write_json(shard, output_dir / f"{prefix}.json")
+    storage.write_json(
+        {"prefixLength": prefix_length, "shards": list(shards)},
+        output_dir / "_index.json",
+    )
+
+    print(f"Search index with {len(shards)} shards written to '{output_dir}'")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("map_file", type=Path, help="A built map.json.")
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--prefix-length", type=int, default=2)
+    return vars(parser.parse_args())
+
+
+def main(map_file: Path, output_dir: Path, prefix_length=2):
+    write_search_index(rjson(map_file), output_dir, prefix_length)
+
+
+if __name__ == "__main__":
+    main(**parse_args())
@@ -0,0 +1,256 @@
+import subprocess
+import zipfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from pathlib import Path, PurePosixPath
+
+import json_codec
+
+
+class Storage(ABC):
+    """Minimal file tree interface the converters read from and write to."""
+
+    @abstractmethod
+    def exists(self, path: Path) -> bool: ...
+
+    @abstractmethod
+    def is_dir(self, path: Path) -> bool: ...
+
+    @abstractmethod
+    def iterdir(self, path: Path) -> Iterator[Path]: ...
+
+    @abstractmethod
+    def mkdir(self, path: Path, parents=False, exist_ok=False): ...
+
+    @abstractmethod
+    def read_text(self, path: Path) -> str: ...
+
+    @abstractmethod
+    def write_text(self, path: Path, text: str): ...
+
+    def read_json(self, path: Path):
+        return json_codec.loads(self.read_text(path))
+
+    def write_json(self, d, path: Path, indent: int | str | None = None):
+        self.write_text(path, json_codec.dumps(d, indent))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalStorage(Storage):
+    """Reads and writes the real filesystem."""
+
+    def exists(self, path: Path):
+        return Path(path).exists()
+
+    def is_dir(self, path: Path):
+        return Path(path).is_dir()
+
+    def iterdir(self, path: Path):
+        return Path(path).iterdir()
+
+    def mkdir(self, path: Path, parents=False, exist_ok=False):
+        Path(path).mkdir(parents=parents, exist_ok=exist_ok)
+
+    def read_text(self, path: Path):
+        return Path(path).read_text()
+
+    def write_text(self, path: Path, text: str):
+        Path(path).write_text(text)
+
+
+def to_key(path: str | Path) -> str:
+    return PurePosixPath(path).as_posix()
+
+
+def parent_key(key: str) -> str | None:
+    parent = PurePosixPath(key).parent
+    return None if parent == PurePosixPath(key) else parent.as_posix()
+
+
+class MemoryStorage(Storage):
+    """Keeps the whole tree in dicts. Paths are only used as keys."""
+
+    def __init__(self):
+        self.files: dict[str, str | None] = {}
+        self.dirs: set[str] = set()
+        self.children: dict[str, list[str]] = {}
+
+    def _add(self, key: str, is_dir: bool):
+        parent = parent_key(key)
+        if parent is not None and not self.is_dir(parent):
+            self._add(parent, True)
+        if is_dir:
+            self.dirs.add(key)
+        if parent is not None:
+            self.children.setdefault(parent, []).append(key)
+
+    def exists(self, path: Path):
+        return to_key(path) in self.files or self.is_dir(path)
+
+    def is_dir(self, path: Path):
+        key = to_key(path)
+        return key in self.dirs or parent_key(key) is None
+
+    def iterdir(self, path: Path):
+        if not self.is_dir(path):
+            raise FileNotFoundError(f"No such directory: '{path}'")
+
+        for child in sorted(self.children.get(to_key(path), [])):
+            yield Path(path) / PurePosixPath(child).name
+
+    def mkdir(self, path: Path, parents=False, exist_ok=False):
+        key = to_key(path)
+        if self.exists(key):
+            if exist_ok and self.is_dir(key):
+                return
+            raise FileExistsError(f"File exists: '{path}'")
+        if not parents and not self.is_dir(parent_key(key)):
+            raise FileNotFoundError(f"No such directory: '{parent_key(key)}'")
+
+        self._add(key, True)
+
+    def read_text(self, path: Path):
+        key = to_key(path)
+        if key not in self.files:
+            raise FileNotFoundError(f"No such file: '{path}'")
+        return self.files[key]
+
+    def write_text(self, path: Path, text: str):
+        key = to_key(path)
+        if not self.is_dir(parent_key(key)):
+            raise FileNotFoundError(f"No such directory: '{parent_key(key)}'")
+        if key in self.dirs:
+            raise IsADirectoryError(f"Is a directory: '{path}'")
+        if key not in self.files:
+            self._add(key, False)
+        self.files[key] = text
+
+
+class LazyStorage(MemoryStorage):
+    """A `MemoryStorage` that reads files with a `None` body through `_load`."""
+
+    def read_text(self, path: Path):
+        key = to_key(path)
+        if key in self.files and self.files[key] is None:
+            self.files[key] = self._load(key)
+        return super().read_text(path)
+
+    @abstractmethod
+    def _load(self, key: str) -> str: ...
+
+
+class ZipStorage(LazyStorage):
+    """A map tree in a zip archive, read on demand or written on close."""
+
+    def __init__(self, archive: str | Path, mode="r"):
+        super().__init__()
+        self.archive = Path(archive)
+        self.mode = mode
+        self._zip: zipfile.ZipFile | None = None
+
+        if mode == "r":
+            self._zip = zipfile.ZipFile(self.archive)
+            for name in self._zip.namelist():
+                key = to_key(name)
+                if not self.exists(key):
+                    self._add(key, name.endswith("/"))
+                if not name.endswith("/"):
+                    self.files[key] = None
+        elif mode != "w":
+            raise ValueError(f"Unsupported mode '{mode}'")
+
+    def _load(self, key: str):
+        return self._zip.read(key).decode()
+
+    def write_text(self, path: Path, text: str):
+        if self.mode != "w":
+            raise PermissionError(f"Archive '{self.archive}' is opened read-only")
+        super().write_text(path, text)
+
+    def close(self):
+        if self.mode == "w":
+            with zipfile.ZipFile(self.archive, "w", zipfile.ZIP_DEFLATED) as zf:
+                for key in sorted(self.dirs):
+                    zf.writestr(key + "/", "")
+                for key, text in sorted(self.files.items()):
+                    zf.writestr(key, text)
+        elif self._zip:
+            self._zip.close()
+
+
+class GitStorage(LazyStorage):
+    """The tree at `rev` of a local git repository, read with `git cat-file --batch`."""
+
+    def __init__(self, repo: str | Path, rev="HEAD"):
+        super().__init__()
+        self.repo = Path(repo)
+        self.rev = rev
+        self._blobs: dict[str, bytes] = {}
+        self._proc: subprocess.Popen | None = None
+
+        listing = subprocess.run(
+            ["git", "-C", str(self.repo), "ls-tree", "-r", "-t", "-z", rev],
+            capture_output=True,
+            check=True,
+        ).stdout
+        for entry in listing.split(b"\0"):
+            if not entry:
+                continue
+            info, name = entry.split(b"\t", 1)
+            _, kind, sha = info.split()
+            key = to_key(name.decode())
+            if kind == b"tree":
+                if not self.exists(key):
+                    self._add(key, True)
+            elif kind == b"blob":
+                self._add(key, False)
+                self.files[key] = None
+                self._blobs[key] = sha
+
+    def _load(self, key: str):
+        if self._proc is None:
+            self._proc = subprocess.Popen(
+                ["git", "-C", str(self.repo), "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+
+        self._proc.stdin.write(self._blobs[key] + b"\n")
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline().split()
+        if len(header) != 3:
+            raise FileNotFoundError(f"Could not read '{key}' at {self.rev}")
+        data = self._proc.stdout.read(int(header[2]))
+        self._proc.stdout.read(1)  # Trailing newline after each object
+        return data.decode()
+
+    def write_text(self, path: Path, text: str):
+        raise PermissionError(f"Git tree '{self.repo}@{self.rev}' is read-only")
+
+    def close(self):
+        if self._proc:
+            self._proc.stdin.close()
+            self._proc.wait()
+            self._proc = None
+
+
+LOCAL_STORAGE = LocalStorage()
+
+
+def open_repo_storage(
+    archive: str | Path | None = None, git_repo: str | Path | None = None, rev="HEAD"
+) -> Storage:
+    """Storage for a map repository packed as a zip archive or kept in git."""
+    if archive:
+        return ZipStorage(archive)
+    if git_repo:
+        return GitStorage(git_repo, rev)
+    return LOCAL_STORAGE
@@ -3,8 +3,11 @@ from pathlib import Path
 import pytest
 
 from convert_to_directories import main as json_to_dirs
+from create_map import MapTree
 from create_map import main as dirs_to_json
-from utils import rjson
+from layout import build_layout
+from storage import MemoryStorage, ZipStorage
+from utils import find_node, iter_nodes, rjson, rtext
 
 TEST_DATA = Path("test_data")
 TEST_OUTPUT = Path("test_output")
@@ -28,3 +31,177 @@ def test_cycle_equal(map_name: str):
     assert rjson(TEST_DATA / map_name / "map.json") == rjson(
         TEST_OUTPUT / map_name / "map.json"
     )
+
+
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_storage_backends_equal(map_name: str, tmp_path: Path):
+    map_file = TEST_DATA / map_name / "map.json"
+    meta_file = TEST_DATA / map_name / "meta.json"
+
+    json_to_dirs(map_file, tmp_path / "local")
+    expected = dirs_to_json(
+        repo_root=tmp_path / "local",
+        meta_file=meta_file,
+        output_file=tmp_path / "local.json",
+    )
+
+    memory = MemoryStorage()
+    json_to_dirs(map_file, Path(map_name), storage=memory)
+    memory.write_text(Path(map_name) / "meta.json", rtext(meta_file))
+    dirs_to_json(
+        repo_root=Path(map_name),
+        output_file=Path("map.json"),
+        storage=memory,
+        output_storage=memory,
+    )
+    assert memory.read_json(Path("map.json")) == expected
+
+    with ZipStorage(tmp_path / "map.zip", "w") as archive:
+        json_to_dirs(map_file, Path(), storage=archive)
+        archive.write_text(Path("meta.json"), rtext(meta_file))
+    dirs_to_json(archive=tmp_path / "map.zip", output_file=tmp_path / "zip.json")
+    assert rjson(tmp_path / "zip.json") == expected
+
+
+def test_git_build_equal(fli_work_repo: Path, tmp_path: Path, git):
+    expected = dirs_to_json(
+        repo_root=fli_work_repo, output_file=tmp_path / "local.json"
+    )
+    git("clone", "-q", "--bare", fli_work_repo, tmp_path / "map.git")
+
+    dirs_to_json(git_repo=tmp_path / "map.git", output_file=tmp_path / "git.json")
+    assert rjson(tmp_path / "git.json") == expected
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.reads: list[Path] = []
+
+    def read_text(self, path: Path):
+        self.reads.append(Path(path))
+        return super().read_text(path)
+
+
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_subtree_build(map_name: str, tmp_path: Path):
+    storage = CountingStorage()
+    json_to_dirs(TEST_DATA / map_name / "map.json", Path(), storage=storage)
+    storage.write_text(Path("meta.json"), rtext(TEST_DATA / map_name / "meta.json"))
+    full = dirs_to_json(
+        repo_root=Path(),
+        output_file=Path("full.json"),
+        storage=storage,
+        output_storage=storage,
+    )
+
+    tree = MapTree(Path(), storage=storage)
+    deep = max(iter_nodes(full), key=lambda item: item[1])[0]
+    assert tree.find(tree.find(deep["id"]).path).id == deep["id"]
+
+    for node_id in (deep["id"], full["breakdowns"][0]["id"] + "1"):
+        storage.reads.clear()
+        subtree = dirs_to_json(
+            repo_root=Path(),
+            output_file=Path("subtree.json"),
+            subtree=node_id,
+            storage=storage,
+            output_storage=storage,
+        )
+        assert subtree == find_node(full, node_id)
+
+        # Ancestors (of the subtree and of link targets) are read to order their
+        # children, sibling subtrees never
+        targets = [tree.find(node_id).path] + [
+            tree.find(link["id"]).path
+            for node, _ in iter_nodes(subtree)
+            for link in node.get("links") or []
+        ]
+        ancestors = {p for target in targets for p in target.parents}
+        for path in storage.reads:
+            assert (
+                targets[0] in path.parents
+                or path.parent in ancestors
+                or path.parent in targets
+                or (
+                    path.parent.parent in ancestors
+                    and path.parent.parent.name.endswith(".")
+                )
+            ), path
+
+
+def test_subtree_export():
+    map_file = TEST_DATA / "breakdowns" / "map.json"
+    full = MemoryStorage()
+    json_to_dirs(map_file, Path(), storage=full)
+    tree = MapTree(Path(), {"rootDir": "AI_Safety."}, full)
+    map_node = tree.find(tree.root.children[1].children[0].path)
+
+    for selector in (map_node.id, str(map_node.path)):
+        partial = MemoryStorage()
+        json_to_dirs(map_file, Path("out"), subtree=selector, storage=partial)
+        files = {key.removeprefix("out/"): text for key, text in partial.files.items()}
+        prefix = map_node.path.parent.as_posix() + "/"
+        assert files == {
+            key.removeprefix(prefix): text
+            for key, text in full.files.items()
+            if key.startswith(map_node.path.as_posix() + "/")
+        }
+
+
+def test_subtree_skips_ancestor_papers():
+    storage = CountingStorage()
+    json_to_dirs(TEST_DATA / "fli" / "map.json", Path(), storage=storage)
+    storage.write_text(Path("meta.json"), rtext(TEST_DATA / "fli" / "meta.json"))
+    tree = MapTree(Path(), storage=storage)
+    map_node = tree.find("001")
+    storage.write_text(tree.root.path / "papers.json", '[{"title": "Root"}]')
+    storage.write_text(map_node.path / "papers.json", '[{"title": "Sub"}]')
+
+    storage.reads.clear()
+    subtree = dirs_to_json(
+        repo_root=Path(),
+        output_file=Path("subtree.json"),
+        subtree="001",
+        storage=storage,
+        output_storage=storage,
+    )
+    assert subtree["papers"] == [{"title": "Sub"}]
+    assert tree.root.path / "papers.json" not in storage.reads
+
+
+def test_subtree_keeps_depths():
+    storage = MemoryStorage()
+    json_to_dirs(TEST_DATA / "fli" / "map.json", Path(), storage=storage)
+    storage.write_text(Path("meta.json"), rtext(TEST_DATA / "fli" / "meta.json"))
+    full = dirs_to_json(
+        repo_root=Path(),
+        output_file=Path("full.json"),
+        storage=storage,
+        output_storage=storage,
+    )
+    dirs_to_json(
+        repo_root=Path(),
+        output_file=Path("subtree.json"),
+        subtree="001",
+        layout_file=Path("layout.json"),
+        preview_dir=Path("preview"),
+        storage=storage,
+        output_storage=storage,
+    )
+    depths = {node["id"]: depth for node, depth in iter_nodes(full)}
+    preview = storage.read_json(Path("preview/preview.json"))
+    assert preview["levels"] == sorted(
+        {depth for node_id, depth in depths.items() if node_id.startswith("001")}
+    )
+    for depth in preview["levels"]:
+        level = storage.read_json(Path(f"preview/{depth}.json"))
+        assert {depths[node_id] for node_id in level} == {depth}
+
+    layout = storage.read_json(Path("layout.json"))
+    full_layout = build_layout(full, storage.read_json(Path("meta.json")))
+    assert layout["nodes"] == {
+        node_id: full_layout["nodes"][node_id]
+        for node_id in depths
+        if node_id.startswith("001")
+    }
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import json_codec
+from utils import rjson
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.fixture
+def restore_backend():
+    backend = json_codec.get_backend()
+    yield
+    json_codec.set_backend(backend)
+
+
+EDGE_CASES = {
+    "paper": {"title": "Ü", "scores": [1e16, 1e-7, 1e-05, 0.00001, 0.0001, -1.5e-8]},
+    "big": 2**70,
+    "keys": {1: "a", 2.5: "b", None: "c"},
+    "text": 'Lines\n  and "quotes", 1e-7',
+    "empty": [[], {}],
+    "non_finite": [float("nan"), float("inf"), -float("inf"), None],
+}
+
+
+@pytest.mark.parametrize("indent", [None, 2, "\t"])
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_backends_match(map_name: str, indent, restore_backend):
+    pytest.importorskip("orjson")
+    tree = rjson(TEST_DATA / map_name / "map.json")
+    expected = json.dumps(tree, ensure_ascii=False, indent=indent)
+
+    for backend in json_codec.get_available_backends():
+        json_codec.set_backend(backend)
+        assert json_codec.dumps(tree, indent=indent) == expected
+        assert json_codec.loads(expected) == tree
+
+
+@pytest.mark.parametrize("indent", [None, 0, 2, 4, "\t"])
+@pytest.mark.parametrize(
+    "value",
+    [EDGE_CASES, [1e-7], 1e-05, 2**70, {"papers": [{"score": float("nan")}]}, [-1e400]],
+)
+def test_backends_match_edge_cases(value, indent, restore_backend):
+    pytest.importorskip("orjson")
+    expected = json.dumps(value, ensure_ascii=False, indent=indent)
+
+    for backend in json_codec.get_available_backends():
+        json_codec.set_backend(backend)
+        assert json_codec.dumps(value, indent=indent) == expected
+
+
+def test_ensure_ascii(restore_backend):
+    paper = {"title": "Über – Ω", "authors": [{"name": "Zoë"}]}
+    for backend in json_codec.get_available_backends():
+        json_codec.set_backend(backend)
+        assert json_codec.dumps(paper, indent="\t", ensure_ascii=True) == json.dumps(
+            paper, indent="\t"
+        )
+
+
+def test_loads_big_ints(restore_backend):
+    for backend in json_codec.get_available_backends():
+        json_codec.set_backend(backend)
+        assert json_codec.loads('{"big": 1180591620717411303424}') == {"big": 2**70}
+
+
+def test_unknown_backend(restore_backend):
+    with pytest.raises(ValueError):
+        json_codec.set_backend("yaml")
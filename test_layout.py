@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import pytest
+
+from create_map import main as dirs_to_json
+from layout import build_layout
+from storage import MemoryStorage
+from utils import iter_nodes, rjson
+
+TEST_DATA = Path("test_data")
+FLI_META = rjson(TEST_DATA / "fli" / "meta.json")
+CHAR_SIZES = FLI_META["customSettings"]["titlesMode"]["avgTextCharSizes"]
+
+
+def check_layout(tree, layout):
+    for node, depth in iter_nodes(tree):
+        node_layout = layout["nodes"][node["id"]]
+        level = layout["levels"][depth]
+        assert " ".join(node_layout["lines"]).split() == node["title"].split()
+        assert all(
+            len(line) <= level["maxChars"] or " " not in line
+            for line in node_layout["lines"]
+        )
+        assert node_layout["height"] == pytest.approx(
+            len(node_layout["lines"]) * level["textSize"] * level["lineHeight"]
+        )
+
+
+def test_layout_wraps_titles():
+    tree = rjson(TEST_DATA / "fli" / "map.json")
+    layout = build_layout(tree, FLI_META)
+
+    check_layout(tree, layout)
+    # horizontalSpacing plus horizontalSpacingAdditions, the last one reused
+    assert [level["width"] for level in layout["levels"]] == [
+        1500,
+        1100,
+        1160,
+        *[1160] * (len(layout["levels"]) - 3),
+    ]
+
+
+def test_layout_width_addition():
+    tree = rjson(TEST_DATA / "breakdowns" / "map.json")
+    layout = build_layout(
+        tree, rjson(TEST_DATA / "breakdowns" / "meta.json"), char_sizes=CHAR_SIZES
+    )
+
+    check_layout(tree, layout)
+    assert layout["levels"][0]["width"] == 900 + 0 + 500
+    assert layout["levels"][1]["width"] == 900 + 300 + 500
+
+
+def test_layout_default_mode_width():
+    tree = rjson(TEST_DATA / "fli" / "map.json")
+    meta = {
+        "customSettings": {
+            "defaultMode": {"nodeWidth": 3200},
+            "titlesMode": {"avgTextCharSizes": CHAR_SIZES},
+        }
+    }
+    layout = build_layout(tree, meta)
+
+    assert {level["width"] for level in layout["levels"]} == {3200}
+
+
+def test_layout_respects_depth_limit():
+    tree = rjson(TEST_DATA / "fli" / "map.json")
+    meta = {
+        "customSettings": {
+            "titlesMode": {
+                **FLI_META["customSettings"]["titlesMode"],
+                "depthLimit": 1,
+            }
+        }
+    }
+    layout = build_layout(tree, meta)
+
+    assert len(layout["levels"]) == 2
+    assert set(layout["nodes"]) == {
+        node["id"] for node, depth in iter_nodes(tree) if depth <= 1
+    }
+
+
+def test_layout_needs_metrics():
+    tree = rjson(TEST_DATA / "breakdowns" / "map.json")
+    with pytest.raises(ValueError):
+        build_layout(tree, rjson(TEST_DATA / "breakdowns" / "meta.json"))
+
+
+def test_layout_fails_before_writing():
+    storage = MemoryStorage()
+    storage.write_text(Path("meta.json"), '{"sourceFile": "tree.json"}')
+    with pytest.raises(ValueError):
+        dirs_to_json(
+            repo_root=Path(),
+            output_file=Path("map.json"),
+            layout_file=Path("layout.json"),
+            storage=storage,
+            output_storage=storage,
+        )
+    assert not storage.exists(Path("map.json"))
@@ -0,0 +1,38 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from convert_to_directories import main as json_to_dirs
+from map_ndjson import dumps_ndjson, from_records, loads_ndjson, to_records
+from storage import MemoryStorage
+from utils import rjson
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_ndjson_lossless(map_name: str):
+    tree = rjson(TEST_DATA / map_name / "map.json")
+    text = dumps_ndjson(tree)
+
+    assert all(json.loads(line)["id"] for line in text.splitlines())
+    assert json.dumps(loads_ndjson(text), ensure_ascii=False) == json.dumps(
+        tree, ensure_ascii=False
+    )
+
+    records = list(to_records(tree))
+    random.Random(0).shuffle(records)
+    assert from_records(records) == tree
+
+
+def test_directories_from_ndjson(tmp_path: Path):
+    map_file = TEST_DATA / "breakdowns" / "map.json"
+    ndjson_file = tmp_path / "map.ndjson"
+    ndjson_file.write_text(dumps_ndjson(rjson(map_file)))
+
+    from_json, from_ndjson = MemoryStorage(), MemoryStorage()
+    json_to_dirs(map_file, Path(), storage=from_json)
+    json_to_dirs(ndjson_file, Path(), storage=from_ndjson)
+    assert from_ndjson.files == from_json.files
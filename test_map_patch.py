@@ -0,0 +1,90 @@
+import copy
+from pathlib import Path
+
+import pytest
+
+import json_codec
+from convert_to_directories import sanitize_filename
+from create_map import main as dirs_to_json
+from map_patch import apply_patch, diff_maps, write_map_patch
+from storage import MemoryStorage
+from utils import OL, find_node, rjson
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.fixture
+def tree():
+    return rjson(TEST_DATA / "fli" / "map.json")
+
+
+def test_small_edit_small_patch(tree: dict):
+    new = copy.deepcopy(tree)
+    find_node(new, "001")["title"] = "Edited"
+
+    ops = diff_maps(tree, new)
+    assert ops == [
+        {"op": "replace", "path": "/breakdowns/0/sub_nodes/1/title", "value": "Edited"}
+    ]
+    assert apply_patch(tree, ops) == new
+
+
+def test_reorder_moves_nodes(tree: dict):
+    new = copy.deepcopy(tree)
+    sub_nodes = new["breakdowns"][0]["sub_nodes"]
+    sub_nodes.insert(0, sub_nodes.pop())
+    added = {"title": "New node", "id": "0099"}
+    sub_nodes.insert(2, added)
+
+    ops = diff_maps(tree, new)
+    assert [op["op"] for op in ops] == ["move", "add"]
+    assert apply_patch(tree, ops) == new
+
+
+def test_reorder_with_regenerated_ids(fli_work_repo: Path, tmp_path: Path):
+    work = fli_work_repo
+    old = dirs_to_json(repo_root=work, output_file=tmp_path / "old.json")
+
+    # Move the last top-level node to the front, the rebuild renumbers every ID
+    titles = [sanitize_filename(n["title"]) for n in old["breakdowns"][0]["sub_nodes"]]
+    root_name = sanitize_filename(old["title"])
+    root_md = work / root_name / f"{root_name}.md"
+    order = OL([titles[-1], *titles[:-1]]).to_str()
+    root_md.write_text(f"{root_md.read_text()}\n\n### Order\n\n{order}\n")
+    new = dirs_to_json(repo_root=work, output_file=tmp_path / "new.json")
+    old_nodes, new_nodes = (
+        old["breakdowns"][0]["sub_nodes"],
+        new["breakdowns"][0]["sub_nodes"],
+    )
+    assert new_nodes[0]["title"] == old_nodes[-1]["title"]
+    assert new_nodes[0]["id"] == old_nodes[0]["id"]
+
+    # One move, the rest only renumbers IDs (of nodes, breakdowns, questions, links)
+    ops = diff_maps(old, new)
+    assert [op["op"] for op in ops if op["op"] != "replace"] == ["move"]
+    assert all(op["path"].endswith("/id") for op in ops if op["op"] == "replace")
+    assert len(json_codec.dumps(ops)) < len(json_codec.dumps(new)) / 2
+    assert json_codec.dumps(apply_patch(old, ops)) == json_codec.dumps(new)
+
+
+def test_key_order_kept(tree: dict):
+    new = copy.deepcopy(tree)
+    node = find_node(new, "001")
+    node_items = list(node.items())
+    node.clear()
+    node.update([("mini_description", "New"), *node_items])
+
+    ops = diff_maps(tree, new)
+    assert json_codec.dumps(apply_patch(tree, ops)) == json_codec.dumps(new)
+
+
+def test_write_map_patch_verifies(tree: dict):
+    new = copy.deepcopy(tree)
+    del new["breakdowns"][0]["sub_nodes"][1]
+    new["breakdowns"][0]["sub_nodes"][0]["questions"] = [{"question": "Why?"}]
+    new["description"] = None
+
+    storage = MemoryStorage()
+    ops = write_map_patch(tree, new, Path("map.patch.json"), storage=storage)
+    assert storage.read_json(Path("map.patch.json")) == ops
+    assert apply_patch(tree, ops) == new
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import pytest
+
+import json_codec
+from map_preview import PREVIEW_FIELDS, build_preview, cut_node, merge_level
+from utils import iter_nodes, rjson
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.mark.parametrize("depth_limit", [0, 1, 2])
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_preview_levels_merge(map_name: str, depth_limit: int):
+    tree = rjson(TEST_DATA / map_name / "map.json")
+    preview, levels = build_preview(tree, depth_limit)
+
+    for node, depth in iter_nodes(preview):
+        assert depth <= depth_limit
+        assert set(node) <= {
+            *PREVIEW_FIELDS,
+            "breakdowns",
+            "child_count",
+            "subtree_size",
+        }
+    cut = [node for node, _ in iter_nodes(preview) if "subtree_size" in node]
+    assert sum(1 for _ in iter_nodes(preview)) + sum(
+        node["subtree_size"] for node in cut
+    ) == sum(1 for _ in iter_nodes(tree))
+    assert len(json_codec.dumps(preview)) < len(json_codec.dumps(tree))
+
+    max_depth = max(depth for _, depth in iter_nodes(tree))
+    assert list(levels) == list(range(max_depth + 1))
+    for level in levels.values():
+        merge_level(preview, level)
+    assert preview == tree
+    assert json_codec.dumps(preview) == json_codec.dumps(tree)
+
+
+def test_level_details():
+    tree = rjson(TEST_DATA / "fli" / "map.json")
+    _, levels = build_preview(tree, 1)
+
+    for node, depth in iter_nodes(tree):
+        details = levels[depth][node["id"]]
+        assert {
+            key: value for key, value in details.items() if key != "breakdowns"
+        } == {key: value for key, value in node.items() if key != "breakdowns"}
+        for breakdown in details.get("breakdowns") or []:
+            for sub_node in breakdown["sub_nodes"]:
+                assert set(sub_node) <= {
+                    *PREVIEW_FIELDS,
+                    "child_count",
+                    "subtree_size",
+                }
+
+
+def test_preview_without_depth_limit():
+    tree = rjson(TEST_DATA / "fli" / "map.json")
+    max_depth = max(depth for _, depth in iter_nodes(tree))
+    preview, levels = build_preview(tree, None)
+
+    assert len(levels) == max_depth + 1
+    assert preview == cut_node(tree, 0, max_depth)
+
+
+def test_preview_keeps_paper_titles():
+    tree = rjson(TEST_DATA / "breakdowns" / "map.json")
+    preview, _ = build_preview(tree, 1)
+
+    papers = {
+        breakdown["id"]: breakdown["paper"]
+        for node, _ in iter_nodes(tree)
+        for breakdown in node.get("breakdowns") or []
+    }
+    breakdowns = [
+        breakdown
+        for node, _ in iter_nodes(preview)
+        for breakdown in node.get("breakdowns") or []
+    ]
+    assert breakdowns
+    for breakdown in breakdowns:
+        assert breakdown["paper"] == {"title": papers[breakdown["id"]]["title"]}
+        assert breakdown["paper"]["title"]
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+
+import json_codec
+from map_size import analyze_map, check_budgets, get_size
+from utils import iter_nodes, rjson
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_sizes_add_up(map_name: str):
+    tree = rjson(TEST_DATA / map_name / "map.json")
+    report = analyze_map(tree)
+
+    assert report["total"] == len(json_codec.dumps(tree).encode())
+    assert sum(report["fields"].values()) == report["total"]
+    assert sum(report["depths"].values()) == (
+        report["total"] - report["fields"]["structure"]
+    )
+
+    subtrees = {node["id"]: node["subtree"] for node in report["nodes"]}
+    for node, _ in iter_nodes(tree):
+        assert subtrees[node["id"]] == get_size(node)
+
+
+def test_budgets():
+    report = analyze_map(rjson(TEST_DATA / "fli" / "map.json"))
+    largest = report["nodes"][0]
+
+    assert (
+        check_budgets(report, {"total": report["total"], "node": largest["own"]}) == []
+    )
+    errors = check_budgets(
+        report,
+        {
+            "total": report["total"] - 1,
+            "node": largest["own"] - 1,
+            "fields": {"descriptions": 0, "papers": 10**9},
+            "depths": {"0": 0},
+        },
+    )
+    assert len(errors) == 4
+    assert largest["id"] in errors[-1]
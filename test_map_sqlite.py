@@ -0,0 +1,69 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from map_sqlite import export_sqlite, get_subtree_ids, import_sqlite
+from utils import find_node, iter_nodes, rjson
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_sqlite_round_trip(map_name: str):
+    tree = rjson(TEST_DATA / map_name / "map.json")
+    conn = export_sqlite(tree, sqlite3.connect(":memory:"))
+
+    assert json.dumps(import_sqlite(conn), ensure_ascii=False) == json.dumps(
+        tree, ensure_ascii=False
+    )
+
+    (node_count,) = conn.execute("SELECT COUNT(*) FROM nodes").fetchone()
+    assert node_count == len(list(iter_nodes(tree)))
+
+    subtree_root = tree["breakdowns"][0]["sub_nodes"][1]
+    assert get_subtree_ids(conn, subtree_root["id"]) == sorted(
+        node["id"] for node, _ in iter_nodes(subtree_root)
+    )
+
+
+def test_sqlite_queries():
+    tree = rjson(TEST_DATA / "breakdowns" / "map.json")
+    conn = export_sqlite(tree, sqlite3.connect(":memory:"))
+
+    arxiv_id, node_id = conn.execute(
+        "SELECT arxiv_id, node_id FROM papers WHERE arxiv_id IS NOT NULL LIMIT 1"
+    ).fetchone()
+    citing = find_node(tree, node_id)
+    assert any(
+        (b.get("paper") or {}).get("arxiv_id") == arxiv_id
+        for b in citing.get("breakdowns") or []
+    ) or any(p.get("arxiv_id") == arxiv_id for p in citing.get("papers") or [])
+
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT node_id FROM papers WHERE arxiv_id = ?",
+        (arxiv_id,),
+    ).fetchall()
+    assert "papers_arxiv_id" in str(plan)
+
+
+def test_sqlite_edits_are_imported():
+    tree = rjson(TEST_DATA / "breakdowns" / "map.json")
+    conn = export_sqlite(tree, sqlite3.connect(":memory:"))
+
+    node_id = tree["breakdowns"][0]["sub_nodes"][0]["id"]
+    with conn:
+        conn.execute("UPDATE nodes SET title = 'Fixed' WHERE id = ?", (node_id,))
+        conn.execute(
+            "UPDATE papers SET title = 'Fixed paper' WHERE breakdown_id = ?",
+            (tree["breakdowns"][0]["id"],),
+        )
+        conn.execute(
+            "DELETE FROM questions WHERE node_id = ? AND position = 0", (tree["id"],)
+        )
+
+    imported = import_sqlite(conn)
+    assert find_node(imported, node_id)["title"] == "Fixed"
+    assert imported["breakdowns"][0]["paper"]["title"] == "Fixed paper"
+    assert imported["questions"] == tree["questions"][1:]
@@ -0,0 +1,32 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from parallel_json import dumps_map
+from utils import rjson
+
+TEST_DATA = Path("test_data")
+
+
+@pytest.mark.parametrize("map_name", ["fli", "breakdowns"])
+def test_parallel_dumps_identical(map_name: str):
+    tree = rjson(TEST_DATA / map_name / "map.json")
+    expected = json.dumps(tree, ensure_ascii=False)
+
+    assert dumps_map(tree, workers=3, min_items=0) == expected
+    assert dumps_map(tree) == expected
+
+
+def test_parallel_dumps_edge_cases():
+    tree = {
+        "title": 'Quotes " and \\ and ü',
+        "breakdowns": [
+            {"id": "00", "sub_nodes": [{"title": "a", "breakdowns": []}, {}]},
+            {"id": "01", "sub_nodes": []},
+        ],
+        "papers": [1.5, 1e-7, 0.00001, 2**70, None, True, {"k": []}],
+    }
+    assert dumps_map(tree, workers=2, min_items=0) == json.dumps(
+        tree, ensure_ascii=False
+    )
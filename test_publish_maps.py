@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from create_map import main as dirs_to_json
+from publish_maps import SITE_SETTINGS_DIR, SITE_TREES_DIR, publish_maps
+from utils import rjson
+
+
+def test_publish_from_local_repos(fli_work_repo: Path, tmp_path: Path, git):
+    expected = dirs_to_json(
+        repo_root=fli_work_repo, output_file=tmp_path / "local.json"
+    )
+    git("clone", "-q", "--bare", fli_work_repo, tmp_path / "maps" / "owner" / "fli.git")
+
+    site = tmp_path / "site"
+    git("init", "-q", site)
+    git("-C", site, "commit", "-q", "--allow-empty", "-m", "init")
+
+    def publish():
+        return publish_maps(
+            site,
+            tmp_path / "maps",
+            allowed_maps={"owner/fli": {"pathName": "fli-map"}},
+            commit=True,
+        )
+
+    (result,) = publish()
+    assert result["error"] is None
+    assert set(result["times"]) == {"build", "meta", "place", "commit"}
+    assert rjson(site / SITE_TREES_DIR / "fli-map.json") == expected
+    meta = rjson(site / SITE_SETTINGS_DIR / "fli-map.json")
+    assert meta["pathName"] == "fli-map"
+    assert "rootDir" not in meta
+    assert git("-C", site, "rev-list", "--count", "HEAD").strip() == "2"
+
+    (result,) = publish()
+    assert result["changed"] == []
+    assert git("-C", site, "rev-list", "--count", "HEAD").strip() == "2"
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from search_index import build_search_index, tokenize, write_search_index
+from storage import MemoryStorage
+from utils import iter_nodes, rjson
+
+TEST_DATA = Path("test_data")
+
+
+def test_tokenize_strips_html():
+    assert tokenize(
+        'See <a href="https://x.org" target="_blank">Russell</a> &amp; <i>Norvig</i>'
+    ) == [
+        "see",
+        "russell",
+        "norvig",
+    ]
+
+
+def test_search_index_shards():
+    tree = rjson(TEST_DATA / "fli" / "map.json")
+    index = build_search_index(tree)
+
+    for node, _ in iter_nodes(tree):
+        for term in tokenize(node["title"]):
+            assert node["id"] in index[term]
+    assert "href" not in index and "blank" not in index
+
+    storage = MemoryStorage()
+    write_search_index(tree, Path("search"), prefix_length=2, storage=storage)
+    manifest = storage.read_json(Path("search/_index.json"))
+    merged = {}
+    for prefix in manifest["shards"]:
+        shard = storage.read_json(Path(f"search/{prefix}.json"))
+        assert all(term[:2] == prefix for term in shard)
+        merged.update(shard)
+    assert merged == index
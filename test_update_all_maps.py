@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from update_all_maps import TokenBucket, dispatch_all, main
+
+
+class StubGitHub(BaseHTTPRequestHandler):
+    server: "StubServer"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        map_repo = payload["client_payload"]["map_repo"]
+        self.server.requests.append(map_repo)
+
+        pending = self.server.failures.get(map_repo)
+        status, headers, body = pending.pop(0) if pending else (204, {}, "")
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubGitHub)
+        # map_repo -> responses to send before succeeding
+        self.failures: dict[str, list[tuple[int, dict, str]]] = {}
+        self.requests: list[str] = []
+        self.url = f"http://127.0.0.1:{self.server_port}"
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def test_dispatch_retries(stub_server: StubServer):
+    stub_server.failures = {
+        "a/server-error": [(502, {}, ""), (503, {}, "")],
+        "b/secondary-limit": [
+            (403, {}, '{"message": "You have exceeded a secondary rate limit"}')
+        ],
+        "c/not-found": [(404, {}, "")],
+    }
+    map_repos = [f"map/{i}" for i in range(10)] + list(stub_server.failures)
+
+    results = dispatch_all(
+        map_repos,
+        "owner/source",
+        "token",
+        api_url=stub_server.url,
+        concurrency=4,
+        rate=1000,
+        burst=10,
+        max_retries=3,
+        backoff=0.01,
+    )
+
+    by_repo = {result["map_repo"]: result for result in results}
+    assert [result["map_repo"] for result in results] == map_repos
+    assert (
+        by_repo["a/server-error"]["ok"] and by_repo["a/server-error"]["attempts"] == 3
+    )
+    assert by_repo["b/secondary-limit"]["ok"]
+    assert not by_repo["c/not-found"]["ok"]
+    assert by_repo["c/not-found"]["attempts"] == 1
+    assert all(by_repo[f"map/{i}"]["attempts"] == 1 for i in range(10))
+
+
+def test_main_fails_on_failed_dispatch(
+    stub_server: StubServer, tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "allowed_maps.json").write_text('{"map/a": {}, "map/b": {}}')
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    monkeypatch.setenv("GITHUB_REPOSITORY", "owner/source")
+    monkeypatch.setenv("GITHUB_API_URL", stub_server.url)
+
+    assert len(main(rate=1000)) == 2
+
+    stub_server.failures = {"map/b": [(404, {}, "")]}
+    with pytest.raises(SystemExit) as exc_info:
+        main(rate=1000)
+    assert exc_info.value.code == 1
+    assert sorted(stub_server.requests) == ["map/a", "map/a", "map/b", "map/b"]
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.18
@@ -1,12 +1,174 @@
+import argparse
 import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TypedDict
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
-def main():
+class DispatchResult(TypedDict):
+    map_repo: str
+    ok: bool
+    attempts: int
+    error: str | None
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_retry_delay(response: requests.Response, attempt: int, backoff: float):
+    """Seconds to wait before retrying, or None if the response shouldn't be retried."""
+    secondary_limit = response.status_code in (403, 429) and (
+        "retry-after" in response.headers
+        or "secondary rate limit" in response.text.lower()
+    )
+    if response.status_code < 500 and not secondary_limit:
+        return None
+
+    if response.headers.get("retry-after", "").isdigit():
+        return float(response.headers["retry-after"])
+    return backoff * 2**attempt
+
+
+def dispatch_map(
+    session: requests.Session,
+    url: str,
+    map_repo: str,
+    bucket: TokenBucket,
+    max_retries=5,
+    backoff=1.0,
+) -> DispatchResult:
+    payload = {
+        "event_type": "update_map",
+        "client_payload": {"map_repo": map_repo},
+    }
+    error = None
+
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            response = session.post(url, json=payload, timeout=30)
+        except requests.RequestException as e:
+            error = str(e)
+            delay = backoff * 2**attempt
+        else:
+            if response.ok:
+                print(f"Successfully triggered update for {map_repo}")
+                return {
+                    "map_repo": map_repo,
+                    "ok": True,
+                    "attempts": attempt + 1,
+                    "error": None,
+                }
+            error = f"{response.status_code} {response.reason}"
+            delay = get_retry_delay(response, attempt, backoff)
+            if delay is None:
+                break
+
+        if attempt < max_retries:
+            print(f"Retrying {map_repo} in {delay:.1f}s ({error})")
+            time.sleep(delay)
+
+    print(f"Error triggering update for {map_repo}: {error}")
+    return {
+        "map_repo": map_repo,
+        "ok": False,
+        "attempts": attempt + 1,
+        "error": error,
+    }
+
+
+def dispatch_all(
+    map_repos: list[str],
+    repo: str,
+    github_token: str,
+    api_url="https://api.github.com",
+    concurrency=4,
+    rate=1.0,
+    burst=1,
+    max_retries=5,
+    backoff=1.0,
+) -> list[DispatchResult]:
+    """Send one `repository_dispatch` per map over a shared, rate limited session."""
+    url = f"{api_url.rstrip('/')}/repos/{repo}/dispatches"
+    bucket = TokenBucket(rate, burst)
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(
+            {
+                "Accept": "application/vnd.github.v3+json",
+                "Authorization": f"token {github_token}",
+            }
+        )
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(
+                pool.map(
+                    lambda map_repo: dispatch_map(
+                        session, url, map_repo, bucket, max_retries, backoff
+                    ),
+                    map_repos,
+                )
+            )
+
+
+def print_summary(results: list[DispatchResult], elapsed: float):
+    failed = [r for r in results if not r["ok"]]
+    retried = sum(r["attempts"] - 1 for r in results)
+
+    print(
+        f"Dispatched {len(results) - len(failed)}/{len(results)} maps "
+        f"in {elapsed:.1f}s ({retried} retries)"
+    )
+    for result in failed:
+        print(f"  Failed: {result['map_repo']} ({result['error']})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="Dispatches per second."
+    )
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument(
+        "--backoff", type=float, default=1.0, help="First retry delay in seconds."
+    )
+    return vars(parser.parse_args())
+
+
+def main(concurrency=4, rate=1.0, burst=1, max_retries=5, backoff=1.0):
     allowed_maps: dict = json.loads(Path("allowed_maps.json").read_text())
 
     # Get the GitHub token from environment variables
@@ -21,31 +183,24 @@ def main():
         print("Error: GITHUB_REPOSITORY environment variable not set")
         return
 
-    # Trigger update workflows for each map
-    for map_repo in allowed_maps.keys():
-        print(f"Triggering update for {map_repo}")
-
-        # Create the dispatch event
-        url = f"https://api.github.com/repos/{repo}/dispatches"
-        headers = {
-            "Accept": "application/vnd.github.v3+json",
-            "Authorization": f"token {github_token}",
-        }
-        payload = {
-            "event_type": "update_map",
-            "client_payload": {"map_repo": map_repo},
-        }
-
-        # Send the request
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            print(f"Successfully triggered update for {map_repo}")
-        except Exception as e:
-            print(f"Error triggering update for {map_repo}: {e}")
+    start = time.monotonic()
+    results = dispatch_all(
+        list(allowed_maps.keys()),
+        repo,
+        github_token,
+        os.environ.get("GITHUB_API_URL", "https://api.github.com"),
+        concurrency,
+        rate,
+        burst,
+        max_retries,
+        backoff,
+    )
+    print_summary(results, time.monotonic() - start)
 
-        time.sleep(15)
+    if not all(result["ok"] for result in results):
+        raise SystemExit(1)
+    return results
 
 
 if __name__ == "__main__":
-    main()
+    main(**parse_args())
@@ -1,10 +1,12 @@
-import json
 import re
+from collections.abc import Iterator
 from pathlib import Path
 from typing import TypedDict, Union
 
 from pydantic import BaseModel, ConfigDict
 
+import json_codec
+
 
 class Question(TypedDict, total=False):
     id: str | None
@@ -29,8 +31,58 @@ class Node(TypedDict, total=False):
     breakdowns: list[Breakdown] | None
 
 
-def get_unique_path(path: Path, spacer="_") -> Path:
-    if not path.exists():
+def iter_nodes(node: Node, depth=0) -> Iterator[tuple[Node, int]]:
+    """Yield every node of a built tree in document order along with its depth."""
+    yield node, depth
+    for breakdown in node.get("breakdowns") or []:
+        for sub_node in breakdown.get("sub_nodes") or []:
+            yield from iter_nodes(sub_node, depth + 1)
+
+
+def get_node_id_idxs(node_id: str, only_node_ids: bool = True) -> list[int]:
+    idxs = []
+    in_closure = None
+    for char in node_id[1:]:
+        if in_closure is not None:
+            if char == ".":
+                idxs.append(int(in_closure))
+                in_closure = None
+            else:
+                in_closure += char
+        else:
+            if char == ".":
+                in_closure = ""
+            else:
+                idxs.append(int(char))
+
+    return [idx for i, idx in enumerate(idxs) if not only_node_ids or i % 2 != 0]
+
+
+def is_node_id(selector: str):
+    return re.fullmatch(r"0[\d.]*", selector) is not None
+
+
+def find_node(tree: Node, node_id: str) -> Node | None:
+    """Follow every breakdown and sub node index in `node_id` down from the root."""
+    idxs = get_node_id_idxs(node_id, only_node_ids=False)
+    if len(idxs) % 2:
+        return None  # Breakdown ID
+
+    node = tree
+    for b_idx, n_idx in zip(idxs[::2], idxs[1::2]):
+        breakdowns = node.get("breakdowns") or []
+        if b_idx >= len(breakdowns):
+            return None
+        sub_nodes = breakdowns[b_idx].get("sub_nodes") or []
+        if n_idx >= len(sub_nodes):
+            return None
+        node = sub_nodes[n_idx]
+
+    return node
+
+
+def get_unique_path(path: Path, spacer="_", exists=Path.exists) -> Path:
+    if not exists(path):
         return path
 
     # Split the path into stem and suffix
@@ -41,7 +93,7 @@ def get_unique_path(path: Path, spacer="_") -> Path:
     counter = 1
     while True:
         new_path = parent / f"{stem}{spacer}{counter}{suffix}"
-        if not new_path.exists():
+        if not exists(new_path):
             return new_path
         counter += 1
 
@@ -60,12 +112,12 @@ def rtext(path: str | Path):
     return Path(path).read_text()
 
 
-def wjson(d: dict, path: str | Path, **kwargs):
-    wtext(json.dumps(d, ensure_ascii=False, **kwargs), path)
+def wjson(d: dict, path: str | Path, indent: int | str | None = None):
+    wtext(json_codec.dumps(d, indent), path)
 
 
 def rjson(path: str | Path) -> dict:
-    return json.loads(rtext(path))
+    return json_codec.loads(rtext(path))
 
 
 def convert_no_ascii(file: str):